@@ -2,10 +2,11 @@
 import os
 from google.adk.agents import Agent
 from .tools import (
-    load_parameter_table,
-    extract_pdf_table_by_title,
-    combine_and_match,
-    save_csv_output
+    load_parameter_table_handle,
+    extract_pdf_table_handle,
+    combine_and_match_handles,
+    save_csv_output_handle,
+    preview_records
 )
 
 def _load_prompt() -> str:
@@ -26,10 +27,12 @@ processor_agent = Agent(
     description="Merges parameter table with two PDF tables and saves CSV",
     model="gemini-2.5-flash",
     instruction=_load_prompt(),
+     # I tool ritornano handle compatti: i record non passano dal contesto del modello
      tools=[
-          load_parameter_table,
-          extract_pdf_table_by_title,
-          combine_and_match,
-          save_csv_output
+          load_parameter_table_handle,
+          extract_pdf_table_handle,
+          combine_and_match_handles,
+          save_csv_output_handle,
+          preview_records
      ]
 )
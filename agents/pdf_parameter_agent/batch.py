@@ -0,0 +1,174 @@
+"""Batch processing: many PDF reports against one parameter table (batch.py)
+
+Percorso diretto (senza LLM): l'indice di join sulla tabella parametri viene
+costruito una sola volta e i PDF vengono distribuiti su un process pool.
+L'indice non viaggia con i task: è salvato una volta nella cache degli stage
+(pipeline.py) e ogni processo worker lo carica una sola volta tramite la sua chiave.
+"""
+import os
+import logging
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Optional
+
+from .pipeline import FileInput, Pipeline, StageCache, cached_extract_table
+from .tools import (
+    build_join_index,
+    combine_and_match,
+    iter_parameter_rows,
+    pdf_columns_with_key,
+    save_csv_output,
+)
+
+logger = logging.getLogger(__name__)
+
+COMBINED_FILENAME = "combined.csv"
+# I CSV dei singoli report stanno in una sottocartella: un PDF chiamato
+# "combined.pdf" non può sovrascrivere il file combinato
+REPORTS_DIRNAME = "reports"
+SOURCE_COLUMN = "source_pdf"
+
+# Indice di join già caricato nel processo worker (solo quello dell'ultimo batch)
+_worker_index: Dict[str, Dict[Any, List[Dict]]] = {}
+_worker_index_lock = threading.Lock()
+
+
+def _stream_join_index(params_path: str, key: Optional[str], case_insensitive: bool):
+    """Stage 'batch_join_index': indice costruito leggendo i parametri in streaming."""
+    return dict(build_join_index(iter_parameter_rows(params_path), key, case_insensitive))
+
+
+def _store_join_index(params_path: str, key: Optional[str], case_insensitive: bool,
+                      cache: StageCache) -> str:
+    """Costruisce (o ritrova) l'indice nella cache degli stage e ne ritorna la chiave."""
+    p = Pipeline(cache)
+    p.stage("batch_join_index", _stream_join_index, params_path=FileInput(params_path),
+            key=key, case_insensitive=case_insensitive)
+    n_keys = len(p.run()["batch_join_index"])
+    logger.info("Batch: indice parametri con %d chiavi (%s)", n_keys, p.status["batch_join_index"])
+    return p.key("batch_join_index")
+
+
+def _load_join_index(params_path: str, key: Optional[str], case_insensitive: bool,
+                     index_key: str, cache_root: str) -> Dict[Any, List[Dict]]:
+    """
+    Indice di join per il worker: memo per processo, altrimenti dalla cache degli stage
+    (una lettura per processo e batch); se nel frattempo è stato rimosso, viene ricostruito.
+    """
+    with _worker_index_lock:
+        if index_key not in _worker_index:
+            try:
+                index = StageCache(cache_root).get("batch_join_index", index_key)
+            except KeyError:
+                index = _stream_join_index(params_path, key, case_insensitive)
+            _worker_index.clear()
+            _worker_index[index_key] = index
+        return _worker_index[index_key]
+
+
+def process_report(pdf_path: str,
+                   param_index: Dict[Any, List[Dict]],
+                   output_path: str,
+                   key: Optional[str] = None,
+                   title: Optional[str] = None,
+                   required_columns: Optional[List[str]] = None,
+                   case_insensitive: bool = False) -> Dict[str, Any]:
+    """
+    Estrae la tabella da un PDF (memoizzata per contenuto, vedi pipeline.py), la unisce
+    all'indice parametri già costruito (stessi key/case_insensitive) e salva il CSV
+    del singolo report.
+    Le colonne estratte includono sempre la chiave di join (vedi pdf_columns_with_key).
+    Ritorna {"pdf", "path", "rows", "records"}.
+    """
+    pdf_rows = cached_extract_table(pdf_path, title, pdf_columns_with_key(required_columns, key))
+    merged = combine_and_match([], pdf_rows, key=key, case_insensitive=case_insensitive,
+                               param_index=param_index)
+    saved = save_csv_output(merged, output_path)
+    return {"pdf": pdf_path, "path": saved["path"], "rows": len(merged), "records": merged}
+
+
+def _process_report_by_index_key(pdf_path: str, params_path: str, index_key: str, cache_root: str,
+                                 output_path: str, key: Optional[str], title: Optional[str],
+                                 required_columns: Optional[List[str]],
+                                 case_insensitive: bool) -> Dict[str, Any]:
+    """Task del pool: riceve solo la chiave dell'indice di join, non l'indice."""
+    param_index = _load_join_index(params_path, key, case_insensitive, index_key, cache_root)
+    return process_report(pdf_path, param_index, output_path, key, title, required_columns,
+                          case_insensitive)
+
+
+def _combine_reports(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Unisce i record di tutti i report aggiungendo la colonna 'source_pdf'.
+    Le righe identiche (a parità di tutte le altre colonne) compaiono una sola volta;
+    'source_pdf' elenca, separati da ';', i report in cui la riga è presente.
+    """
+    combined: Dict[tuple, Dict[str, Any]] = {}
+    for res in results:
+        source = os.path.basename(res["pdf"])
+        for rec in res.get("records", []):
+            sig = tuple(sorted((str(k), str(v)) for k, v in rec.items()))
+            if sig in combined:
+                sources = combined[sig][SOURCE_COLUMN].split(";")
+                if source not in sources:
+                    combined[sig][SOURCE_COLUMN] += f";{source}"
+                continue
+            combined[sig] = {**rec, SOURCE_COLUMN: source}
+    return list(combined.values())
+
+
+def run_batch(params_path: str,
+              pdf_paths: List[str],
+              output_dir: str,
+              key: Optional[str] = None,
+              case_insensitive: bool = False,
+              title: Optional[str] = None,
+              required_columns: Optional[List[str]] = None,
+              executor: Optional[Executor] = None,
+              max_workers: Optional[int] = None,
+              cache: Optional[StageCache] = None) -> Dict[str, Any]:
+    """
+    Elabora tutti i PDF contro la stessa tabella parametri.
+    - L'indice di join è costruito una volta (lettura in streaming di CSV/XLSX) e
+      salvato nella cache degli stage: ai worker passa solo la sua chiave.
+    - I PDF sono distribuiti su 'executor' (o su un ProcessPoolExecutor temporaneo).
+    - Ogni report produce <output_dir>/reports/<nome_pdf>.csv; il file combinato e
+      deduplicato con colonna 'source_pdf' è <output_dir>/combined.csv.
+    Un report che fallisce non blocca gli altri: compare con "status": "error".
+    Fa eccezione BrokenProcessPool (worker morto, es. OOM): il pool è inutilizzabile
+    e l'errore viene propagato al chiamante, che deve ricrearlo.
+    """
+    cache = cache or StageCache()
+    index_key = _store_join_index(params_path, key, case_insensitive, cache)
+    logger.info("Batch: %d PDF", len(pdf_paths))
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = []
+        for pdf_path in pdf_paths:
+            name = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_path = os.path.join(output_dir, REPORTS_DIRNAME, f"{name}.csv")
+            futures.append(executor.submit(_process_report_by_index_key, pdf_path, params_path,
+                                           index_key, cache.root, output_path,
+                                           key, title, required_columns, case_insensitive))
+
+        results: List[Dict[str, Any]] = []
+        for pdf_path, fut in zip(pdf_paths, futures):
+            try:
+                results.append({"status": "success", **fut.result()})
+            except BrokenProcessPool:
+                raise
+            except Exception as ex:
+                logger.warning("Batch: report %s fallito: %s", pdf_path, ex)
+                results.append({"status": "error", "pdf": pdf_path, "error": str(ex)})
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    combined = _combine_reports([r for r in results if r["status"] == "success"])
+    saved = save_csv_output(combined, os.path.join(output_dir, COMBINED_FILENAME))
+    reports = [{k: v for k, v in r.items() if k != "records"} for r in results]
+    return {"reports": reports, "combined": {"path": saved["path"], "rows": len(combined)}}
@@ -0,0 +1,96 @@
+"""Per-job token accounting and budgets for the LLM path: budget.py"""
+import os
+from typing import Dict, Any, Optional
+
+# Azioni possibili quando il budget è superato
+BUDGET_ACTION_ABORT = "abort"    # il job fallisce
+BUDGET_ACTION_DIRECT = "direct"  # il job prosegue sul percorso diretto (senza LLM)
+
+
+class BudgetExceeded(Exception):
+    """Sollevata quando un job supera il budget e l'azione configurata è 'abort'."""
+
+
+class TokenBudget:
+    """
+    Conta i token (da usage_metadata degli Event ADK) e le chiamate al modello di un job.
+    I limiti a None sono disattivati.
+    """
+
+    def __init__(self,
+                 max_total_tokens: Optional[int] = None,
+                 max_llm_calls: Optional[int] = None,
+                 action: str = BUDGET_ACTION_ABORT):
+        if action not in (BUDGET_ACTION_ABORT, BUDGET_ACTION_DIRECT):
+            raise ValueError(f"Unknown budget action: {action}")
+        self.max_total_tokens = max_total_tokens
+        self.max_llm_calls = max_llm_calls
+        self.action = action
+        self.prompt_tokens = 0
+        self.candidates_tokens = 0
+        self.total_tokens = 0
+        self.llm_calls = 0
+
+    @staticmethod
+    def config_from_env() -> Dict[str, Any]:
+        """
+        Legge e valida AGENT_MAX_TOTAL_TOKENS, AGENT_MAX_LLM_CALLS, AGENT_BUDGET_ACTION.
+        Ritorna i kwargs del costruttore; ValueError con il nome della variabile se non valida
+        (il server la chiama una volta all'avvio).
+        """
+        def _int(name: str) -> Optional[int]:
+            value = os.environ.get(name, "").strip()
+            if not value:
+                return None
+            try:
+                limit = int(value)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer, got '{value}'") from None
+            if limit < 0:
+                raise ValueError(f"{name} must be >= 0, got {limit}")
+            return limit
+
+        action = os.environ.get("AGENT_BUDGET_ACTION", BUDGET_ACTION_ABORT).strip().lower()
+        if action not in (BUDGET_ACTION_ABORT, BUDGET_ACTION_DIRECT):
+            raise ValueError(f"AGENT_BUDGET_ACTION must be '{BUDGET_ACTION_ABORT}' or "
+                             f"'{BUDGET_ACTION_DIRECT}', got '{action}'")
+        return {"max_total_tokens": _int("AGENT_MAX_TOTAL_TOKENS"),
+                "max_llm_calls": _int("AGENT_MAX_LLM_CALLS"),
+                "action": action}
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        """Budget da AGENT_MAX_TOTAL_TOKENS, AGENT_MAX_LLM_CALLS, AGENT_BUDGET_ACTION."""
+        return cls(**cls.config_from_env())
+
+    def add_event(self, ev) -> None:
+        """Accumula l'usage di un Event (gli Event senza usage_metadata sono ignorati)."""
+        usage = getattr(ev, "usage_metadata", None)
+        if usage is None:
+            return
+        prompt = getattr(usage, "prompt_token_count", None) or 0
+        candidates = getattr(usage, "candidates_token_count", None) or 0
+        total = getattr(usage, "total_token_count", None) or (prompt + candidates)
+        self.prompt_tokens += prompt
+        self.candidates_tokens += candidates
+        self.total_tokens += total
+        self.llm_calls += 1
+
+    def exceeded(self) -> Optional[str]:
+        """Motivo del superamento del budget, oppure None."""
+        if self.max_total_tokens is not None and self.total_tokens > self.max_total_tokens:
+            return f"token budget exceeded ({self.total_tokens} > {self.max_total_tokens})"
+        if self.max_llm_calls is not None and self.llm_calls > self.max_llm_calls:
+            return f"LLM call budget exceeded ({self.llm_calls} > {self.max_llm_calls})"
+        return None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "candidates_tokens": self.candidates_tokens,
+            "total_tokens": self.total_tokens,
+            "llm_calls": self.llm_calls,
+            "max_total_tokens": self.max_total_tokens,
+            "max_llm_calls": self.max_llm_calls,
+            "action": self.action,
+        }
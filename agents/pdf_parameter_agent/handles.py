@@ -0,0 +1,101 @@
+"""Compact handles for tool results: handles.py
+
+I tool dell'agente non restituiscono al modello i record completi (che finirebbero
+nel contesto come function response), ma un handle compatto:
+    {"handle": "<cache key>", "record_count": int, "columns": [...]}
+I record restano in memoria e il tool successivo li recupera tramite l'handle.
+
+- Con uno 'scope' (la sessione ADK del job, vedi scope_of) i record stanno in uno
+  spazio del job, senza eviction: job concorrenti non si scartano a vicenda gli
+  handle. Il server libera lo spazio a fine job con release_scope; gli spazi non
+  rilasciati scadono dopo SCOPE_TTL_SECONDS.
+- Senza scope (uso diretto dei tool, test) si usa una cache LRU condivisa.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Union
+
+# Numero massimo di risultati tenuti nella cache condivisa (i più vecchi vengono scartati)
+MAX_CACHED_RESULTS = 64
+# Spazi di job non rilasciati (job interrotti) più vecchi di così vengono eliminati
+SCOPE_TTL_SECONDS = 3600
+
+_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+# scope -> {"records": {handle: records}, "touched": ultimo accesso (time.time())}
+_scopes: Dict[str, Dict[str, Any]] = {}
+_lock = threading.Lock()
+
+
+def scope_of(tool_context: Any) -> Optional[str]:
+    """Scope degli handle per un tool ADK: l'id della sessione (una per job), se disponibile."""
+    session = getattr(tool_context, "session", None)
+    return getattr(session, "id", None)
+
+
+def _prune_scopes(now: float) -> None:
+    expired = [s for s, entry in _scopes.items() if now - entry["touched"] > SCOPE_TTL_SECONDS]
+    for s in expired:
+        del _scopes[s]
+
+
+def put_records(records: List[Dict[str, Any]], prefix: str = "rec",
+                scope: Optional[str] = None) -> Dict[str, Any]:
+    """Mette in cache i record (nello spazio 'scope', se dato) e ritorna il loro handle compatto."""
+    payload = json.dumps(records, sort_keys=True, default=str).encode("utf-8")
+    key = f"{prefix}_{hashlib.sha256(payload).hexdigest()[:16]}"
+    with _lock:
+        if scope is None:
+            _cache[key] = records
+            _cache.move_to_end(key)
+            while len(_cache) > MAX_CACHED_RESULTS:
+                _cache.popitem(last=False)
+        else:
+            now = time.time()
+            _prune_scopes(now)
+            entry = _scopes.setdefault(scope, {"records": {}, "touched": now})
+            entry["records"][key] = records
+            entry["touched"] = now
+
+    columns: List[str] = []
+    for r in records:
+        for c in r:
+            if c not in columns:
+                columns.append(c)
+    return {"handle": key, "record_count": len(records), "columns": columns}
+
+
+def get_records(handle: str, scope: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Ritorna i record associati a un handle: prima nello spazio 'scope', poi nella
+    cache condivisa (KeyError se scaduto o sconosciuto).
+    """
+    with _lock:
+        entry = _scopes.get(scope) if scope is not None else None
+        if entry is not None and handle in entry["records"]:
+            entry["touched"] = time.time()
+            return entry["records"][handle]
+        if handle not in _cache:
+            raise KeyError(f"Unknown or expired handle: {handle}")
+        _cache.move_to_end(handle)
+        return _cache[handle]
+
+
+def release_scope(scope: Optional[str]) -> None:
+    """Libera i record di un job concluso."""
+    if scope is None:
+        return
+    with _lock:
+        _scopes.pop(scope, None)
+
+
+def resolve_records(value: Union[str, Dict[str, Any], List[Dict[str, Any]]],
+                    scope: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Accetta un handle (stringa o dict con "handle") oppure direttamente i record."""
+    if isinstance(value, str):
+        return get_records(value, scope)
+    if isinstance(value, dict) and "handle" in value:
+        return get_records(value["handle"], scope)
+    return value
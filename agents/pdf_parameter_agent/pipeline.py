@@ -0,0 +1,263 @@
+"""Incremental report pipeline: pipeline.py
+
+Il percorso diretto è modellato come un piccolo DAG di stage:
+
+    load_params ──► join_index ──┐
+                                 ├──► combine ──► save
+    extract_table ───────────────┘
+
+La chiave di ogni stage è l'hash dei suoi input (i file per contenuto, sha256)
+e delle chiavi degli stage da cui dipende; gli output sono memoizzati su disco.
+Quando un job viene rieseguito cambiando solo la tabella parametri o la chiave
+di join, titolo e tabella del PDF non vengono ricalcolati: extract_table memoizza
+la tabella completa, la selezione delle colonne (che dipende dalla chiave) è in combine.
+"""
+import os
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from .tools import (
+    DEFAULT_TABLE_TITLE,
+    build_join_index,
+    combine_and_match,
+    extract_pdf_table_by_title,
+    iter_parameter_rows,
+    pdf_columns_with_key,
+    save_csv_output,
+    select_columns,
+)
+
+logger = logging.getLogger(__name__)
+
+# Versione della logica degli stage: cambiarla invalida tutta la cache
+PIPELINE_VERSION = "2"
+STAGE_CACHE_DIR = os.environ.get("STAGE_CACHE_DIR", "data/cache/stages")
+
+STAGE_COMPUTED = "computed"
+STAGE_SKIPPED = "skipped"   # output riusato dalla cache
+STAGE_UNUSED = "unused"     # non necessario: tutti gli stage a valle erano in cache
+
+
+class FileInput:
+    """Input di tipo file: entra nella chiave dello stage con l'hash del contenuto."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+class StageCache:
+    """
+    Output degli stage serializzati (pickle) in <root>/<stage>/<key>.pkl.
+    Sicura tra thread e processi: scritture atomiche su file temporanei distinti;
+    un file rimosso da prune() durante la lettura è semplicemente un miss (KeyError).
+    """
+
+    def __init__(self, root: str = STAGE_CACHE_DIR):
+        self.root = root
+
+    def _path(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, f"{key}.pkl")
+
+    def has(self, stage: str, key: str) -> bool:
+        return os.path.exists(self._path(stage, key))
+
+    def get(self, stage: str, key: str) -> Any:
+        """Output memoizzato dello stage; KeyError se assente (o appena rimosso da prune)."""
+        path = self._path(stage, key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # ultimo utilizzo, per prune()
+        except FileNotFoundError:
+            raise KeyError(f"{stage}/{key}") from None
+        return value
+
+    def put(self, stage: str, key: str, value: Any) -> None:
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # pid + thread: i job diretti girano in run_in_threadpool, anche sulla stessa chiave
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def prune(self, max_age_seconds: float, now: Optional[float] = None) -> int:
+        """Rimuove gli output non usati da più di max_age_seconds; ritorna quanti."""
+        now = time.time() if now is None else now
+        removed = 0
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                try:
+                    if now - os.path.getmtime(path) >= max_age_seconds:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    continue  # sostituito o rimosso nel frattempo da un altro job
+        return removed
+
+
+class Pipeline:
+    """
+    DAG di stage con input hashati e output memoizzati.
+    - stage(name, fn, deps={arg: stage}, memoize=True, **inputs): 'fn' riceve gli
+      input (i FileInput come path) più gli output degli stage in 'deps'.
+    - run(): esegue solo ciò che serve; 'status' riporta per ogni stage
+      computed / skipped / unused.
+    """
+
+    def __init__(self, cache: Optional[StageCache] = None):
+        self.cache = cache or StageCache()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, str] = {}
+        self._values: Dict[str, Any] = {}
+        self.status: Dict[str, str] = {}
+
+    def stage(self, name: str, fn: Callable[..., Any],
+              deps: Optional[Dict[str, str]] = None,
+              memoize: bool = True, **inputs: Any) -> "Pipeline":
+        for dep in (deps or {}).values():
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = {"fn": fn, "deps": deps or {}, "memoize": memoize, "inputs": inputs}
+        return self
+
+    def key(self, name: str) -> str:
+        """Hash di input e chiavi upstream (non dipende dagli output, quindi non richiede di calcolarli)."""
+        if name not in self._keys:
+            st = self._stages[name]
+            payload = {
+                "version": PIPELINE_VERSION,
+                "stage": name,
+                "inputs": {k: (v.digest() if isinstance(v, FileInput) else v)
+                           for k, v in sorted(st["inputs"].items())},
+                "deps": {arg: self.key(dep) for arg, dep in sorted(st["deps"].items())},
+            }
+            blob = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+            self._keys[name] = hashlib.sha256(blob).hexdigest()
+        return self._keys[name]
+
+    def _value(self, name: str) -> Any:
+        if name in self._values:
+            return self._values[name]
+        st = self._stages[name]
+        key = self.key(name)
+        cached = False
+        if st["memoize"]:
+            try:
+                value = self.cache.get(name, key)
+                cached = True
+            except KeyError:
+                pass
+        if cached:
+            self.status[name] = STAGE_SKIPPED
+        else:
+            kwargs = {k: (v.path if isinstance(v, FileInput) else v) for k, v in st["inputs"].items()}
+            kwargs.update({arg: self._value(dep) for arg, dep in st["deps"].items()})
+            value = st["fn"](**kwargs)
+            if st["memoize"]:
+                self.cache.put(name, key, value)
+            self.status[name] = STAGE_COMPUTED
+        self._values[name] = value
+        return value
+
+    def run(self, targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Calcola i target (default: tutti gli stage senza dipendenti) e ritorna i loro output."""
+        if targets is None:
+            upstream = {dep for st in self._stages.values() for dep in st["deps"].values()}
+            targets = [name for name in self._stages if name not in upstream]
+        out = {name: self._value(name) for name in targets}
+        for name in self._stages:
+            self.status.setdefault(name, STAGE_UNUSED)
+        return out
+
+
+# -----------------------------------------------------------------------------
+# Pipeline del report (percorso diretto)
+# -----------------------------------------------------------------------------
+def _load_params(params_path: str) -> List[Dict[str, Any]]:
+    return list(iter_parameter_rows(params_path))
+
+
+def _join_index(param_rows: List[Dict[str, Any]], key: Optional[str], case_insensitive: bool):
+    return dict(build_join_index(param_rows, key, case_insensitive))
+
+
+def _combine(param_index, pdf_rows: List[Dict[str, Any]], key: Optional[str], case_insensitive: bool,
+             required_columns: Optional[List[str]]):
+    # colonne richieste (default DEFAULT_REQUIRED_COLUMNS) più la chiave di join
+    pdf_rows = select_columns(pdf_rows, pdf_columns_with_key(required_columns, key))
+    return combine_and_match([], pdf_rows, key=key, case_insensitive=case_insensitive, param_index=param_index)
+
+
+def _add_extract_stage(p: Pipeline, pdf_path: str, title: Optional[str]) -> None:
+    # tabella completa: la stessa voce di cache serve qualunque selezione di colonne
+    p.stage("extract_table", extract_pdf_table_by_title,
+            pdf_path=FileInput(pdf_path),
+            title=title or DEFAULT_TABLE_TITLE)
+
+
+def cached_extract_table(pdf_path: str,
+                         title: Optional[str] = None,
+                         required_columns: Optional[List[str]] = None,
+                         cache: Optional[StageCache] = None) -> List[Dict[str, Any]]:
+    """
+    Stage 'extract_table' da solo: stessa cache della pipeline del report (agente e batch).
+    Come extract_pdf_table_by_title, senza 'required_columns' ritorna tutte le colonne.
+    """
+    p = Pipeline(cache)
+    _add_extract_stage(p, pdf_path, title)
+    records = p.run()["extract_table"]
+    return select_columns(records, required_columns) if required_columns else records
+
+
+def build_report_pipeline(params_path: str,
+                          pdf_path: str,
+                          output_path: str,
+                          key: Optional[str] = None,
+                          case_insensitive: bool = False,
+                          title: Optional[str] = None,
+                          required_columns: Optional[List[str]] = None,
+                          cache: Optional[StageCache] = None) -> Pipeline:
+    """
+    DAG load_params/extract_table → join_index → combine → save per un singolo report.
+    Le righe del PDF sono ridotte a 'required_columns' (default DEFAULT_REQUIRED_COLUMNS)
+    più la chiave di join, così qualunque chiave presente nel PDF viene usata.
+    """
+    p = Pipeline(cache)
+    p.stage("load_params", _load_params, params_path=FileInput(params_path))
+    _add_extract_stage(p, pdf_path, title)
+    p.stage("join_index", _join_index, deps={"param_rows": "load_params"},
+            key=key, case_insensitive=case_insensitive)
+    p.stage("combine", _combine, deps={"param_index": "join_index", "pdf_rows": "extract_table"},
+            key=key, case_insensitive=case_insensitive, required_columns=required_columns)
+    # il salvataggio scrive nel job corrente: sempre eseguito
+    p.stage("save", save_csv_output, deps={"records": "combine"}, memoize=False, output_path=output_path)
+    return p
+
+
+def run_report_pipeline(params_path: str,
+                        pdf_path: str,
+                        output_path: str,
+                        key: Optional[str] = None,
+                        **kwargs: Any) -> Dict[str, Any]:
+    """
+    Esegue la pipeline del report ricalcolando solo gli stage a valle di ciò che è cambiato.
+    Ritorna {"path", "rows", "stages": {stage: computed|skipped|unused}}.
+    """
+    p = build_report_pipeline(params_path, pdf_path, output_path, key, **kwargs)
+    out = p.run(["combine", "save"])
+    logger.info("Pipeline %s: %s", os.path.basename(pdf_path), p.status)
+    return {"path": out["save"]["path"], "rows": len(out["combine"]), "stages": dict(p.status)}
@@ -2,10 +2,13 @@
 import os
 import re
 import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 import pandas as pd
 import pdfplumber
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 from collections import defaultdict
+from .handles import put_records, resolve_records, scope_of
 
 # Camelot is optional and can fail on some PDFs; we try it first if available
 try:
@@ -14,27 +17,143 @@ try:
 except Exception:
     _CAM_AVAILABLE = False
 
-def load_parameter_table(file_path: str):
+# pyarrow is optional: when available, results are also saved as Parquet for paginated reads
+try:
+    import pyarrow  # noqa: F401
+    _ARROW_AVAILABLE = True
+except Exception:
+    _ARROW_AVAILABLE = False
+
+# Titolo di default della tabella da estrarre dal PDF (vedi prompt.md)
+DEFAULT_TABLE_TITLE = "ndings below are leftovers from previous tests and were automatically pulled for the current test"
+# Colonne estratte dalla tabella del PDF (vedi prompt.md)
+DEFAULT_REQUIRED_COLUMNS = ["Severity", "Assets", "Description"]
+
+# Oltre questa dimensione un workbook è segnalato come "large" nei metadati
+LARGE_WORKBOOK_BYTES = 50 * 1024 * 1024
+
+
+def _iter_xlsx_records(file_path: str,
+                       sheet_name: Optional[str] = None,
+                       columns: Optional[List[str]] = None,
+                       max_rows: Optional[int] = None,
+                       meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
     """
-    Load the parameter table (.csv or .xlsx). Expected: 3 columns.
-    Returns: list[dict]
+    Legge un .xlsx riga per riga in modalità read-only (openpyxl), senza caricare
+    il DOM del workbook né costruire un DataFrame.
+    - 'sheet_name': foglio da leggere (default: il primo),
+    - 'columns': proiezione sulle sole colonne indicate (nell'ordine dato),
+    - 'max_rows': numero massimo di righe dati,
+    - 'meta': se passato, viene popolato con foglio e colonne effettive.
+    La prima riga del foglio è l'header (nomi duplicati resi unici con suffisso "_dup");
+    le righe completamente vuote sono saltate.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if sheet_name is not None:
+            if sheet_name not in wb.sheetnames:
+                raise ValueError(f"Sheet '{sheet_name}' not found in {file_path}: {wb.sheetnames}")
+            ws = wb[sheet_name]
+        else:
+            ws = wb.worksheets[0]
+
+        rows = ws.iter_rows(values_only=True)
+        header_row = next(rows, None) or ()
+        # Header normalizzati e unici (come in _extract_table_on_page): colonne con lo
+        # stesso nome non si sovrascrivono nel dict della riga
+        header = []
+        seen = set()
+        for i, h in enumerate(header_row):
+            name = ("" if h is None else str(h)).strip() or f"col_{i}"
+            while name in seen:
+                name = f"{name}_dup"
+            seen.add(name)
+            header.append(name)
+
+        if columns:
+            missing = [c for c in columns if c not in header]
+            if missing:
+                raise ValueError(f"Columns {missing} not found in sheet '{ws.title}': {header}")
+            picked = [(header.index(c), c) for c in columns]
+        else:
+            picked = list(enumerate(header))
+
+        if meta is not None:
+            meta["sheet"] = ws.title
+            meta["columns"] = [c for _, c in picked]
+
+        count = 0
+        for row in rows:
+            if max_rows is not None and count >= max_rows:
+                break
+            if not any(v is not None and v != "" for v in row):
+                continue
+            yield {name: (row[i] if i < len(row) else None) for i, name in picked}
+            count += 1
+    finally:
+        wb.close()
+
+
+def iter_parameter_rows(file_path: str,
+                        sheet_name: Optional[str] = None,
+                        columns: Optional[List[str]] = None,
+                        max_rows: Optional[int] = None,
+                        meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Itera le righe della tabella parametri (.csv o .xlsx) come dict.
+    Gli .xlsx sono letti in streaming (vedi _iter_xlsx_records), così le righe
+    possono alimentare direttamente build_join_index.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Parameter file not found: {file_path}")
 
+    size = os.path.getsize(file_path)
+    if meta is not None:
+        meta["source"] = file_path
+        meta["size_bytes"] = size
+
     if file_path.lower().endswith(".csv"):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path, engine="openpyxl")
+        df = pd.read_csv(file_path, usecols=columns, nrows=max_rows)
+        if columns:
+            df = df[columns]
+        if meta is not None:
+            meta["format"] = "csv"
+            meta["columns"] = [str(c) for c in df.columns]
+        yield from df.to_dict(orient="records")
+        return
+
+    if meta is not None:
+        meta["format"] = "xlsx"
+        meta["large_workbook"] = size >= LARGE_WORKBOOK_BYTES
+    yield from _iter_xlsx_records(file_path, sheet_name, columns, max_rows, meta)
+
+
+def load_parameter_table(file_path: str,
+                         sheet_name: Optional[str] = None,
+                         columns: Optional[List[str]] = None,
+                         max_rows: Optional[int] = None,
+                         with_metadata: bool = False):
+    """
+    Load the parameter table (.csv or .xlsx). Expected: 3 columns.
+    .xlsx workbooks are streamed in read-only mode; 'sheet_name', 'columns'
+    and 'max_rows' select the sheet, project columns and cap the rows.
+    Returns: list[dict], or {"records": list[dict], "metadata": dict} if with_metadata
+    (metadata flags workbooks above LARGE_WORKBOOK_BYTES with "large_workbook").
+    """
+    meta: Dict[str, Any] = {}
+    records = list(iter_parameter_rows(file_path, sheet_name, columns, max_rows, meta))
+    meta["rows"] = len(records)
 
     # Optional: simple validation for 3 columns
-    if df.shape[1] != 3:
+    if len(meta.get("columns", [])) != 3:
         # Not hard failing, but warning via extra field
-        df.attrs["warning"] = "Expected 3 columns; proceeding anyway."
-
-    return df.to_dict(orient="records")
-
+        meta["warning"] = "Expected 3 columns; proceeding anyway."
 
+    if with_metadata:
+        return {"records": records, "metadata": meta}
+    return records
 
 
 def _normalize_space_and_chars(s: str) -> str:
@@ -76,106 +195,262 @@ def _jaccard_similarity(a_tokens: List[str], b_tokens: List[str]) -> float:
     return inter / union if union else 0.0
 
 
-def _page_matches_title(lines: List[str],
-                        target_title: str,
-                        allow_partial: bool = True,
-                        min_token_coverage: float = 0.8,
-                        jaccard_threshold: float = 0.6) -> bool:
+# Punteggio per strategia di match del titolo (più alto = più affidabile).
+# Le strategie "parziali" aggiungono una quota proporzionale a quanto il match è pulito.
+TITLE_STRATEGY_SCORES = {
+    "exact": 1.0,
+    "exact_joined": 0.95,
+    "contains": 0.8,
+    "contains_joined": 0.75,
+    "coverage": 0.5,
+    "coverage_joined": 0.45,
+    "jaccard_page": 0.0,
+}
+
+# Soglia di early-exit di find_title_pages / extract_pdf_table_by_title: un match esatto o "contains" su una
+# riga (anche per titoli frammento, come DEFAULT_TABLE_TITLE) chiude la ricerca alla
+# prima pagina, come prima del ranking; i match più deboli continuano la scansione.
+TITLE_EARLY_EXIT_SCORE = TITLE_STRATEGY_SCORES["contains"]
+
+
+def _score_title_candidates(lines: List[str],
+                            target_title: str,
+                            allow_partial: bool = True,
+                            min_token_coverage: float = 0.8,
+                            jaccard_threshold: float = 0.6) -> List[Dict[str, Any]]:
     """
-    Ritorna True se la pagina contiene il titolo (con diverse tolleranze):
+    Valuta in un solo passaggio tutte le posizioni della pagina che contengono il titolo
+    e ritorna i candidati ordinati dal migliore:
+        {"line_span": [start, end] | None, "score": float, "strategy": str}
+    Le tolleranze sono le stesse di _page_matches_title:
     - match esatto normalizzato su una riga,
-    - match parziale (contains) se allow_partial=True,
+    - match parziale (contains / copertura token) se allow_partial=True,
     - match su due righe adiacenti concatenate (titolo spezzato),
-    - Jaccard similarity su token come ultima ratio.
+    - Jaccard similarity su token di tutta la pagina come ultima ratio (line_span None).
     """
     target_norm = _normalize_space_and_chars(target_title)
     target_tokens = _tokenize(target_title)
-
-    # 1) match riga per riga
+    target_set = set(target_tokens)
+    candidates: List[Dict[str, Any]] = []
+
+    def add(span, strategy, bonus=0.0):
+        candidates.append({
+            "line_span": span,
+            "score": round(TITLE_STRATEGY_SCORES[strategy] + bonus, 4),
+            "strategy": strategy,
+        })
+
+    def coverage(text: str) -> float:
+        tokens = set(_tokenize(text))
+        if not tokens:
+            return 0.0
+        return sum(1 for t in target_set if t in tokens) / max(1, len(target_set))
+
+    def match_text(text: str, span: List[int], suffix: str, partial: bool) -> None:
+        # una sola strategia per posizione: la più stretta che passa
+        if text == target_norm:
+            add(span, "exact" + suffix)
+        elif partial and target_norm and target_norm in text:
+            add(span, "contains" + suffix, 0.1 * len(target_norm) / len(text))
+        elif partial:
+            cov = coverage(text)
+            if cov >= min_token_coverage:
+                add(span, "coverage" + suffix, 0.2 * cov)
+
+    # 1-2) riga per riga
     norm_lines = [_normalize_space_and_chars(l) for l in lines]
-    if any(l == target_norm for l in norm_lines):
-        return True
-
-    # 2) contains (parziale)
-    if allow_partial:
-        # copertura token: almeno min_token_coverage dei token target devono apparire nell'insieme della riga
-        for l in norm_lines:
-            if target_norm in l:
-                return True
-            # coverage su token
-            l_tokens = set(_tokenize(l))
-            if l_tokens:
-                covered = sum(1 for t in set(target_tokens) if t in l_tokens) / max(1, len(set(target_tokens)))
-                if covered >= min_token_coverage:
-                    return True
+    for i, l in enumerate(norm_lines):
+        match_text(l, [i, i], "", allow_partial)
 
     # 3) titolo spezzato su 2 righe: concatena righe adiacenti
     for i in range(len(norm_lines) - 1):
         joined = _normalize_space_and_chars(norm_lines[i] + " " + norm_lines[i + 1])
-        if joined == target_norm:
-            return True
-        if allow_partial and (target_norm in joined):
-            return True
-        # coverage token
-        j_tokens = set(_tokenize(joined))
-        if allow_partial and j_tokens:
-            covered = sum(1 for t in set(target_tokens) if t in j_tokens) / max(1, len(set(target_tokens)))
-            if covered >= min_token_coverage:
-                return True
+        match_text(joined, [i, i + 1], "_joined", allow_partial)
 
     # 4) Jaccard similarity su tutta la pagina (tutti i tokens)
     page_tokens = set()
     for l in norm_lines:
         page_tokens.update(_tokenize(l))
-    if _jaccard_similarity(target_tokens, list(page_tokens)) >= jaccard_threshold:
-        return True
+    jac = _jaccard_similarity(target_tokens, list(page_tokens))
+    if jac >= jaccard_threshold:
+        add(None, "jaccard_page", 0.4 * jac)
 
-    return False
+    candidates.sort(key=lambda c: -c["score"])
+    return candidates
 
 
-def extract_pdf_table_by_title(
+def _page_matches_title(lines: List[str],
+                        target_title: str,
+                        allow_partial: bool = True,
+                        min_token_coverage: float = 0.8,
+                        jaccard_threshold: float = 0.6) -> bool:
+    """
+    Ritorna True se la pagina contiene il titolo (con diverse tolleranze):
+    vedi _score_title_candidates per le strategie.
+    """
+    return bool(_score_title_candidates(lines, target_title, allow_partial,
+                                        min_token_coverage, jaccard_threshold))
+
+
+def _page_text_lines(page) -> List[str]:
+    """Testo della pagina spezzato in righe, senza hyphenation a capo."""
+    text = page.extract_text() or ""
+    # rimuovi hyphenation a capo (es. "lega-\ncy" -> "legacy")
+    text = re.sub(r"-\s*\n\s*", "", text)
+    return text.splitlines()
+
+
+# Evento condiviso con i worker del pool: quando è settato, le scansioni in corso si fermano.
+_SCAN_STOP_EVENT = None
+
+# Sotto questa soglia di pagine il pool costa più di quanto fa risparmiare
+PARALLEL_MIN_PAGES = 32
+
+
+def _init_scan_worker(stop_event) -> None:
+    global _SCAN_STOP_EVENT
+    _SCAN_STOP_EVENT = stop_event
+
+
+def _scan_page_range(pdf_path: str,
+                     start: int,
+                     stop: Optional[int],
+                     match_kwargs: Dict[str, Any],
+                     early_exit_score: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Cerca il titolo nelle pagine [start, stop) e ritorna, in ordine di pagina,
+    il miglior candidato di ogni pagina che matcha:
+        {"page": int (0-based), "line_span", "score", "strategy"}
+    Se 'early_exit_score' è dato, si ferma alla prima pagina con score >= soglia
+    (che è l'ultimo elemento della lista).
+    Apre un proprio handle pdfplumber, così può girare in un processo separato.
+    """
+    found: List[Dict[str, Any]] = []
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = pdf.pages[start:stop]
+        for offset, page in enumerate(pages):
+            if _SCAN_STOP_EVENT is not None and _SCAN_STOP_EVENT.is_set():
+                break
+            try:
+                candidates = _score_title_candidates(_page_text_lines(page), **match_kwargs)
+            finally:
+                # libera la cache della pagina (layout, oggetti) su PDF lunghi
+                page.close()
+            if not candidates:
+                continue
+            found.append({"page": start + offset, **candidates[0]})
+            if early_exit_score is not None and candidates[0]["score"] >= early_exit_score:
+                break
+    return found
+
+
+def _scan_pages_parallel(pdf_path: str,
+                         match_kwargs: Dict[str, Any],
+                         early_exit_score: Optional[float] = None,
+                         max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Versione parallela di _scan_page_range sull'intero documento.
+    Le pagine sono divise in blocchi contigui (più blocchi che worker, così i primi
+    finiscono presto). Se un blocco raggiunge 'early_exit_score', il risultato è
+    confermato quando tutti i blocchi precedenti hanno finito: a quel punto i worker
+    residui vengono fermati e i blocchi in coda cancellati. Il risultato coincide
+    con quello della scansione sequenziale.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        n_pages = len(pdf.pages)
+
+    workers = max(1, max_workers or os.cpu_count() or 1)
+    if workers == 1 or n_pages < PARALLEL_MIN_PAGES:
+        return _scan_page_range(pdf_path, 0, None, match_kwargs, early_exit_score)
+
+    n_chunks = min(n_pages, workers * 4)
+    bounds = [(n_pages * k // n_chunks, n_pages * (k + 1) // n_chunks) for k in range(n_chunks)]
+
+    def hit(chunk: List[Dict[str, Any]]) -> bool:
+        return early_exit_score is not None and bool(chunk) and chunk[-1]["score"] >= early_exit_score
+
+    stop_event = multiprocessing.Event()
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   initializer=_init_scan_worker,
+                                   initargs=(stop_event,))
+    try:
+        futures = {
+            executor.submit(_scan_page_range, pdf_path, lo, hi, match_kwargs, early_exit_score): k
+            for k, (lo, hi) in enumerate(bounds)
+        }
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        found: List[Dict[str, Any]] = []
+        next_chunk = 0  # primo blocco non ancora confermato
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[futures[fut]] = fut.result()
+            # avanza sui blocchi consecutivi già conclusi
+            while next_chunk in results:
+                found.extend(results[next_chunk])
+                if hit(results[next_chunk]):
+                    return found
+                next_chunk += 1
+        return found
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def find_title_pages(
     pdf_path: str,
-    title: str = "ndings below are leftovers from previous tests and were automatically pulled for the current test",
-    flavor: str = "lattice",  # "lattice" o "stream"
-    required_columns: Optional[List[str]] = None,  # es. ["Severity", "Assets", "Description"]
-    allow_partial_title: bool = True,            # consente match parziale/robusto
-    min_token_coverage: float = 0.8,             # % token del titolo che devono apparire
-    jaccard_threshold: float = 0.6               # soglia similarità token su pagina
+    title: str,
+    top_k: int = 3,
+    early_exit_score: Optional[float] = TITLE_EARLY_EXIT_SCORE,
+    allow_partial_title: bool = True,
+    min_token_coverage: float = 0.8,
+    jaccard_threshold: float = 0.6,
+    parallel_pages: bool = False,
+    max_workers: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
-    Estrae UNA SINGOLA tabella dalla pagina che contiene (robustamente) il titolo passato.
-    - Match titolo: tollerante a spazi speciali, spezzature di riga, contenuti parziali.
-    - Estrattori: Camelot (se disponibile) → fallback a pdfplumber.
-    - Se 'required_columns' è fornito, filtra e ordina tali colonne (aggiunge vuote se mancanti).
+    Classifica le pagine che contengono il titolo, dalla più probabile:
+        [{"page": int (0-based), "line_span": [start, end] | None, "score": float, "strategy": str}, ...]
+    - 'top_k': quanti candidati restituire.
+    - 'early_exit_score': la scansione si ferma alla prima pagina con score >= soglia
+      (default TITLE_EARLY_EXIT_SCORE: match esatto o contenuto in una riga, così anche
+      un titolo frammento chiude la scansione e ferma i worker paralleli); 1.0 solo sul
+      match esatto, None per scansionare tutto il documento.
+    - A parità di score vince la pagina che viene prima.
     """
-
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
 
-    # 1) Trova la pagina con il titolo (con tolleranza)
-    page_index_with_title: Optional[int] = None
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text() or ""
-            # rimuovi hyphenation a capo (es. "lega-\ncy" -> "legacy")
-            text = re.sub(r"-\s*\n\s*", "", text)
-            lines = text.splitlines()
-            if _page_matches_title(
-                lines,
-                target_title=title,
-                allow_partial=allow_partial_title,
-                min_token_coverage=min_token_coverage,
-                jaccard_threshold=jaccard_threshold
-            ):
-                page_index_with_title = i
-                break
+    match_kwargs = {
+        "target_title": title,
+        "allow_partial": allow_partial_title,
+        "min_token_coverage": min_token_coverage,
+        "jaccard_threshold": jaccard_threshold,
+    }
+    if parallel_pages:
+        found = _scan_pages_parallel(pdf_path, match_kwargs, early_exit_score, max_workers)
+    else:
+        found = _scan_page_range(pdf_path, 0, None, match_kwargs, early_exit_score)
 
-    if page_index_with_title is None:
-        raise ValueError(f"Title '{title}' not found in PDF (even with tolerant matching).")
+    found.sort(key=lambda c: (-c["score"], c["page"]))
+    return found[:max(1, top_k)]
 
-    page_num_for_camelot = page_index_with_title + 1  # Camelot usa 1-based
 
-    # 2) Prova Camelot su quella pagina
+def _clean_cell(v) -> str:
+    return re.sub(r"\s*\n\s*", " ", str(v)).strip()
+
+
+def _extract_table_on_page(pdf_path: str,
+                           page_index: int,
+                           flavor: str = "lattice") -> Optional[List[Dict[str, Any]]]:
+    """
+    Estrae la tabella della pagina indicata (0-based) come records, oppure None.
+    Estrattori: Camelot (se disponibile) → fallback a pdfplumber.
+    """
+    page_num_for_camelot = page_index + 1  # Camelot usa 1-based
+
+    # 1) Prova Camelot su quella pagina
     table_records: Optional[List[Dict[str, Any]]] = None
 
     if _CAM_AVAILABLE and not os.environ.get("FORCE_PDFPLUMBER"):
@@ -187,16 +462,16 @@ def extract_pdf_table_by_title(
                     header = df.iloc[0].astype(str).str.strip().tolist()
                     data = df.iloc[1:].copy()
                     data.columns = header
-                    data = data.applymap(lambda v: re.sub(r"\s*\n\s*", " ", str(v)).strip())
+                    data = data.applymap(_clean_cell)
                     table_records = data.to_dict(orient="records")
                     break  # prima tabella valida
         except Exception:
             pass  # fallback a pdfplumber
 
-    # 3) Fallback: pdfplumber sulla stessa pagina
+    # 2) Fallback: pdfplumber sulla stessa pagina
     if table_records is None:
         with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_index_with_title]
+            page = pdf.pages[page_index]
             extracted = page.extract_tables() or []
             for tbl in extracted:
                 if not tbl or len(tbl) < 2:
@@ -219,12 +494,71 @@ def extract_pdf_table_by_title(
                 for r in rows:
                     rec = {}
                     for col, val in zip(norm_header, r):
-                        v = "" if val is None else re.sub(r"\s*\n\s*", " ", str(val)).strip()
-                        rec[col] = v
+                        rec[col] = "" if val is None else _clean_cell(val)
                     records.append(rec)
                 table_records = records
                 #break  # prima tabella valida
 
+    return table_records
+
+
+def extract_pdf_table_by_title(
+    pdf_path: str,
+    title: str = DEFAULT_TABLE_TITLE,
+    flavor: str = "lattice",  # "lattice" o "stream"
+    required_columns: Optional[List[str]] = None,  # es. ["Severity", "Assets", "Description"]
+    allow_partial_title: bool = True,            # consente match parziale/robusto
+    min_token_coverage: float = 0.8,             # % token del titolo che devono apparire
+    jaccard_threshold: float = 0.6,              # soglia similarità token su pagina
+    parallel_pages: bool = False,                # scansione pagine su process pool
+    max_workers: Optional[int] = None,           # worker del pool (default: CPU)
+    title_candidates: int = 3,                   # pagine candidate da provare, dalla migliore
+    page_index: Optional[int] = None,            # pagina nota (0-based): salta la ricerca
+    early_exit_score: Optional[float] = TITLE_EARLY_EXIT_SCORE  # None = scansiona tutto
+) -> List[Dict[str, Any]]:
+    """
+    Estrae UNA SINGOLA tabella dalla pagina che contiene (robustamente) il titolo passato.
+    - Match titolo: tollerante a spazi speciali, spezzature di riga, contenuti parziali.
+      Le pagine candidate sono classificate per score (vedi find_title_pages) e provate
+      in ordine finché una contiene una tabella.
+    - 'early_exit_score': la ricerca si ferma alla prima pagina con score >= soglia
+      (default TITLE_EARLY_EXIT_SCORE: match esatto o contenuto in una riga); 1.0 solo
+      sul match esatto, None per classificare tutte le pagine del documento.
+    - Con 'parallel_pages' la ricerca del titolo è distribuita su più processi
+      (utile su PDF molto lunghi), con lo stesso risultato della ricerca sequenziale.
+    - Estrattori: Camelot (se disponibile) → fallback a pdfplumber.
+    - Se 'required_columns' è fornito, filtra e ordina tali colonne (aggiunge vuote se mancanti).
+    """
+
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+
+    # 1) Pagine candidate con il titolo (con tolleranza), dalla migliore
+    if page_index is not None:
+        pages = [page_index]
+    else:
+        pages = [c["page"] for c in find_title_pages(
+            pdf_path,
+            title,
+            top_k=title_candidates,
+            early_exit_score=early_exit_score,
+            allow_partial_title=allow_partial_title,
+            min_token_coverage=min_token_coverage,
+            jaccard_threshold=jaccard_threshold,
+            parallel_pages=parallel_pages,
+            max_workers=max_workers,
+        )]
+
+    if not pages:
+        raise ValueError(f"Title '{title}' not found in PDF (even with tolerant matching).")
+
+    # 2) Prima pagina candidata che contiene una tabella
+    table_records: Optional[List[Dict[str, Any]]] = None
+    for idx in pages:
+        table_records = _extract_table_on_page(pdf_path, idx, flavor)
+        if table_records is not None:
+            break
+
     if table_records is None:
         raise ValueError(
             f"No tables detected on the page containing the title '{title}'."
@@ -232,36 +566,43 @@ def extract_pdf_table_by_title(
 
     # 4) (Opzionale) Filtra colonne richieste
     if required_columns:
-        def norm(s: str) -> str:
-            return _normalize_space_and_chars(s)
-
-        existing_cols = list(table_records[0].keys()) if table_records else []
-
-        def map_column(existing_cols, req_col):
-            req_norm = norm(req_col)
-            # match esatto normalizzato
-            for c in existing_cols:
-                if norm(c) == req_norm:
-                    return c
-            # fallback: contenimento (asset vs assets)
-            for c in existing_cols:
-                if req_norm in norm(c) or norm(c) in req_norm:
-                    return c
-            return None
+        table_records = select_columns(table_records, required_columns)
 
-        col_map = {rc: map_column(existing_cols, rc) for rc in required_columns}
+    return table_records
 
-        filtered_records = []
-        for rec in table_records:
-            filtered = {}
-            for rc in required_columns:
-                src = col_map.get(rc)
-                filtered[rc] = rec.get(src, "") if src else ""
-            filtered_records.append(filtered)
 
-        table_records = filtered_records
+def select_columns(records: List[Dict[str, Any]], required_columns: List[str]) -> List[Dict[str, Any]]:
+    """
+    Filtra e ordina le colonne richieste (aggiunge vuote quelle mancanti).
+    Match del nome normalizzato, con fallback sul contenimento (asset vs assets).
+    """
+    def norm(s: str) -> str:
+        return _normalize_space_and_chars(s)
+
+    existing_cols = list(records[0].keys()) if records else []
+
+    def map_column(existing_cols, req_col):
+        req_norm = norm(req_col)
+        # match esatto normalizzato
+        for c in existing_cols:
+            if norm(c) == req_norm:
+                return c
+        # fallback: contenimento (asset vs assets)
+        for c in existing_cols:
+            if req_norm in norm(c) or norm(c) in req_norm:
+                return c
+        return None
 
-    return table_records
+    col_map = {rc: map_column(existing_cols, rc) for rc in required_columns}
+
+    filtered_records = []
+    for rec in records:
+        filtered = {}
+        for rc in required_columns:
+            src = col_map.get(rc)
+            filtered[rc] = rec.get(src, "") if src else ""
+        filtered_records.append(filtered)
+    return filtered_records
 
 
 def _needs_semicolon_fix(rows: List[Dict]) -> bool:
@@ -323,10 +664,49 @@ def _normalize_key_value(v, case_insensitive: bool = False):
 
 
 
+def pdf_columns_with_key(required_columns: Optional[List[str]] = None,
+                         key: Optional[str] = None) -> List[str]:
+    """
+    Colonne da tenere dalla tabella PDF sul percorso diretto: 'required_columns'
+    (default DEFAULT_REQUIRED_COLUMNS) più la chiave di join, se non è già tra
+    queste; senza la chiave la INNER JOIN non troverebbe alcun match.
+    """
+    columns = list(required_columns or DEFAULT_REQUIRED_COLUMNS)
+    join_key = (key or "Assets").strip()
+    if _normalize_space_and_chars(join_key) not in {_normalize_space_and_chars(c) for c in columns}:
+        columns.append(join_key)
+    return columns
+
+
+def build_join_index(param_rows: Iterable[Dict],
+                     key: Optional[str] = None,
+                     case_insensitive: bool = False) -> Dict[Any, List[Dict]]:
+    """
+    Indicizza le righe parametri sul valore normalizzato della chiave di join,
+    scartando le righe senza chiave. Accetta anche un iteratore (es. iter_parameter_rows),
+    così un workbook grande non viene mai materializzato per intero.
+    """
+    join_key = (key or "Assets").strip()
+    index: Dict[Any, List[Dict]] = defaultdict(list)
+    for r in param_rows:
+        row = {(k.strip() if isinstance(k, str) else k): v for k, v in r.items()}
+        kv = _normalize_key_value(row.get(join_key), case_insensitive)
+        if kv is None:
+            continue
+        index[kv].append(row)
+    return index
+
+
 def combine_and_match(param_rows: List[Dict],
                       table1_rows: List[Dict],
                       key: Optional[str] = None,
-                      case_insensitive: bool = False) -> List[Dict]:
+                      case_insensitive: bool = False,
+                      param_index: Optional[Dict[Any, List[Dict]]] = None) -> List[Dict]:
+    """
+    INNER JOIN delle righe PDF con la tabella parametri sulla chiave 'key' (default "Assets").
+    Se 'param_index' (da build_join_index, stessa key/case_insensitive) è fornito,
+    'param_rows' è ignorato e l'indice viene riusato così com'è.
+    """
     join_key = (key or "Assets").strip()
 
     # --- Normalizza i nomi delle colonne (trim) ---
@@ -336,7 +716,8 @@ def combine_and_match(param_rows: List[Dict],
             fixed.append({(k.strip() if isinstance(k, str) else k): v for k, v in r.items()})
         return fixed
 
-    param_rows = trim_keys(param_rows)
+    if param_index is None:
+        param_rows = trim_keys(param_rows)
     table1_rows = trim_keys(table1_rows)
 
     # --- Normalizza il valore della chiave (trim e opzionale casefold) ---
@@ -352,10 +733,14 @@ def combine_and_match(param_rows: List[Dict],
 
 
     # --- Controllo esistenza chiave (INNER JOIN: se manca in uno, nessun match) ---
-    param_cols = {k for r in param_rows for k in r}
+    if param_index is None:
+        param_cols = {k for r in param_rows for k in r}
+        if len(param_cols) == 1 and ";" in list(param_cols)[0]:
+            param_cols = set(list(param_cols)[0].split(";"))
+    else:
+        # un indice senza righe equivale a chiave assente nei parametri
+        param_cols = {join_key} if param_index else set()
     pdf_cols   = {k for r in table1_rows for k in r}
-    if len(param_cols) == 1 and ";" in list(param_cols)[0]:
-        param_cols = set(list(param_cols)[0].split(";"))
     if len(pdf_cols) == 1 and ";" in list(pdf_cols)[0]:
         pdf_cols = set(list(pdf_cols)[0].split(";"))
 
@@ -363,12 +748,7 @@ def combine_and_match(param_rows: List[Dict],
         return []  # niente match possibili
 
     # --- Indicizza CSV su chiave normalizzata, scartando righe senza chiave ---
-    index = defaultdict(list)
-    for row in param_rows:
-        kv = norm_val(row.get(join_key))
-        if kv is None:
-            continue
-        index[kv].append(row)
+    index = param_index if param_index is not None else build_join_index(param_rows, join_key, case_insensitive)
 
     # --- INNER JOIN: tieni solo le righe PDF con match ---
     out: List[Dict] = []
@@ -387,11 +767,93 @@ def combine_and_match(param_rows: List[Dict],
     return out
 
 
+# Righe per row group nella copia Parquet: è la granularità delle letture paginate
+PARQUET_ROW_GROUP_SIZE = 5000
+
+
+def parquet_sidecar_path(csv_path: str) -> str:
+    """Path della copia Parquet salvata accanto a un CSV di output."""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
 def save_csv_output(records: list[dict], output_path: str = "data/output/result.csv"):
     """
     Save records to CSV.
+    If pyarrow is available, a Parquet copy (all columns as strings, like the CSV)
+    is written next to it for paginated reads.
     """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = pd.DataFrame(records)
     df.to_csv(output_path, index=False)
+
+    parquet_path = parquet_sidecar_path(output_path)
+    if os.path.exists(parquet_path):
+        os.remove(parquet_path)  # mai lasciare una copia non allineata al CSV
+    if _ARROW_AVAILABLE:
+        try:
+            df.astype("string").to_parquet(parquet_path, index=False,
+                                           row_group_size=PARQUET_ROW_GROUP_SIZE)
+        except Exception:
+            # la copia Parquet è solo un'ottimizzazione: senza, si legge il CSV
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
     return {"status": "success", "path": os.path.abspath(output_path)}
+
+
+# -----------------------------------------------------------------------------
+# Tool per l'agente: ritornano handle compatti invece dei record completi,
+# così i dati non passano dal contesto del modello (vedi handles.py).
+# 'tool_context' è iniettato da ADK (non compare nella dichiarazione del tool):
+# gli handle sono tenuti nello spazio della sessione del job.
+# -----------------------------------------------------------------------------
+def load_parameter_table_handle(file_path: str, tool_context: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Load the parameter table (.csv or .xlsx) and keep the rows server-side.
+    Returns: {"handle", "record_count", "columns"}; pass "handle" to combine_and_match_handles.
+    """
+    return put_records(load_parameter_table(file_path), prefix="params", scope=scope_of(tool_context))
+
+
+def extract_pdf_table_handle(pdf_path: str,
+                             title: str = DEFAULT_TABLE_TITLE,
+                             required_columns: Optional[List[str]] = None,
+                             tool_context: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Extract the table found under 'title' in the PDF and keep the rows server-side.
+    Returns: {"handle", "record_count", "columns"}; pass "handle" to combine_and_match_handles.
+    """
+    # import locale: pipeline.py dipende da questo modulo
+    from .pipeline import cached_extract_table
+    records = cached_extract_table(pdf_path, title=title, required_columns=required_columns)
+    return put_records(records, prefix="pdf", scope=scope_of(tool_context))
+
+
+def combine_and_match_handles(param_handle: str,
+                              pdf_handle: str,
+                              key: Optional[str] = None,
+                              case_insensitive: bool = False,
+                              tool_context: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Join the rows behind 'pdf_handle' with the parameter rows behind 'param_handle' on 'key'.
+    Returns: {"handle", "record_count", "columns"} of the merged rows.
+    """
+    scope = scope_of(tool_context)
+    merged = combine_and_match(resolve_records(param_handle, scope), resolve_records(pdf_handle, scope),
+                               key=key, case_insensitive=case_insensitive)
+    return put_records(merged, prefix="merged", scope=scope)
+
+
+def save_csv_output_handle(records_handle: str, output_path: str = "data/output/result.csv",
+                           tool_context: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Save the rows behind 'records_handle' to CSV.
+    """
+    return save_csv_output(resolve_records(records_handle, scope_of(tool_context)), output_path)
+
+
+def preview_records(handle: str, limit: int = 5, tool_context: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Return the first 'limit' rows behind a handle (max 20), to inspect the data if needed.
+    """
+    records = resolve_records(handle, scope_of(tool_context))
+    return {"record_count": len(records), "rows": records[:max(0, min(limit, 20))]}
@@ -0,0 +1,188 @@
+"""Content-addressed store for uploaded inputs: blob_store.py
+
+Ogni upload è salvato una sola volta sotto data/blobs/<sha[:2]>/<sha256><ext>;
+le cartelle dei job contengono solo un hardlink al blob (nessuna copia dei dati)
+e un piccolo manifest.json. Un indice (refs.json) tiene il conteggio dei
+riferimenti per blob, usato dalla garbage collection.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+REFS_NAME = "refs.json"
+
+
+def _atomic_write_json(path: str, data: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+class BlobStore:
+    """
+    Blob store indirizzato per contenuto (sha256) con reference counting.
+    - put(): scrive il blob solo se non esiste già,
+    - add_job_file(): collega un blob alla cartella di un job e registra il riferimento,
+    - gc(): rimuove i job scaduti (input e output) e i blob non più referenziati.
+    Thread-safe all'interno di un processo (un lock protegge refs.json).
+    """
+
+    def __init__(self, root: str = "data/blobs"):
+        self.root = root
+        self._refs_path = os.path.join(root, REFS_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Blob
+    # -------------------------------------------------------------------------
+    def blob_path(self, sha256: str, ext: str = "") -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256}{ext.lower()}")
+
+    def put(self, data: bytes, ext: str = "") -> Tuple[str, str, bool]:
+        """Salva i byte se non presenti. Ritorna (sha256, path, created)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256, ext)
+        if os.path.exists(path):
+            # aggiorna l'mtime: un blob appena riusato non è candidato alla GC
+            os.utime(path)
+            return sha256, path, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        return sha256, path, True
+
+    # -------------------------------------------------------------------------
+    # Job
+    # -------------------------------------------------------------------------
+    def add_job_file(self, job_id: str, job_dir: str, role: str,
+                     filename: str, data: bytes) -> Dict[str, Any]:
+        """
+        Registra un file di input del job:
+        - salva (o riusa) il blob,
+        - crea un hardlink job_dir/filename → blob (se il filesystem non lo
+          consente, il job referenzia direttamente il path del blob),
+        - aggiorna manifest del job e refcount del blob.
+        Ritorna la voce del manifest ({"path": ..., "sha256": ..., "cached": ...}).
+        """
+        ext = os.path.splitext(filename)[1]
+        sha256, blob, created = self.put(data, ext)
+
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, os.path.basename(filename))
+        try:
+            if not os.path.exists(path):
+                os.link(blob, path)
+        except OSError as ex:
+            logger.info("Hardlink non disponibile (%s): uso il blob %s", ex, blob)
+            path = blob
+
+        entry = {
+            "filename": filename,
+            "sha256": sha256,
+            "size": len(data),
+            "path": path,
+            "blob": blob,
+            "cached": not created,
+        }
+        with self._lock:
+            manifest_path = os.path.join(job_dir, MANIFEST_NAME)
+            manifest = _read_json(manifest_path, {"job_id": job_id, "created_at": time.time(), "files": {}})
+            manifest["files"][role] = entry
+            _atomic_write_json(manifest_path, manifest)
+
+            refs = _read_json(self._refs_path, {})
+            jobs = set(refs.get(blob, []))
+            jobs.add(job_id)
+            refs[blob] = sorted(jobs)
+            _atomic_write_json(self._refs_path, refs)
+        return entry
+
+    def refcount(self, blob: str) -> int:
+        with self._lock:
+            return len(_read_json(self._refs_path, {}).get(blob, []))
+
+    def release_job(self, job_id: str, job_dir: str) -> None:
+        """Rimuove la cartella del job e i suoi riferimenti ai blob."""
+        manifest = _read_json(os.path.join(job_dir, MANIFEST_NAME), {"files": {}})
+        with self._lock:
+            refs = _read_json(self._refs_path, {})
+            for entry in manifest.get("files", {}).values():
+                jobs = [j for j in refs.get(entry.get("blob"), []) if j != job_id]
+                if jobs:
+                    refs[entry["blob"]] = jobs
+                else:
+                    refs.pop(entry.get("blob"), None)
+            _atomic_write_json(self._refs_path, refs)
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    # -------------------------------------------------------------------------
+    # Garbage collection
+    # -------------------------------------------------------------------------
+    def gc(self, input_dir: str, output_dir: str,
+           retention_seconds: float, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Politica di retention:
+        - i job in input_dir/output_dir più vecchi di retention_seconds vengono rimossi
+          (per l'input vale created_at del manifest, altrimenti l'mtime della cartella),
+        - i blob con refcount 0 vengono cancellati.
+        Ritorna il numero di job e blob rimossi.
+        """
+        now = time.time() if now is None else now
+        removed_jobs = 0
+
+        for base, is_input in ((input_dir, True), (output_dir, False)):
+            if not os.path.isdir(base):
+                continue
+            for job_id in os.listdir(base):
+                job_dir = os.path.join(base, job_id)
+                if not os.path.isdir(job_dir):
+                    continue
+                manifest = _read_json(os.path.join(job_dir, MANIFEST_NAME), {})
+                created = manifest.get("created_at") or os.path.getmtime(job_dir)
+                if now - created < retention_seconds:
+                    continue
+                if is_input:
+                    self.release_job(job_id, job_dir)
+                else:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+                removed_jobs += 1
+
+        removed_blobs = 0
+        with self._lock:
+            refs = _read_json(self._refs_path, {})
+            for dirpath, _, files in os.walk(self.root):
+                for name in files:
+                    path = os.path.join(dirpath, name)
+                    if name == REFS_NAME or refs.get(path):
+                        continue
+                    # un blob appena scritto/riusato può non essere ancora referenziato:
+                    # lo si cancella solo dopo la retention
+                    if now - os.path.getmtime(path) >= retention_seconds:
+                        os.remove(path)
+                        refs.pop(path, None)
+                        removed_blobs += 1
+            _atomic_write_json(self._refs_path, refs)
+
+        if removed_jobs or removed_blobs:
+            logger.info("GC: rimossi %d job e %d blob", removed_jobs, removed_blobs)
+        return {"jobs": removed_jobs, "blobs": removed_blobs}
@@ -0,0 +1,119 @@
+"""Offline load test of /run-agent: loadtest.py
+
+Esempio (nessuna rete: il modello è ReplayLlm, i tool girano davvero):
+
+    python loadtest.py --replay data/recordings/<job_id>.jsonl \\
+        --params params.csv --pdf report.pdf --concurrency 1,4,16 --requests 32
+
+La registrazione si ottiene avviando il server con AGENT_RECORD_DIR=data/recordings
+ed eseguendo una volta il job reale. Con --url si punta a un server già avviato
+(in quel caso AGENT_REPLAY_FILE va impostata sul server).
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, Any, List
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+async def run_level(client, concurrency: int, n_requests: int,
+                    files: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """
+    Esegue n_requests richieste con al massimo 'concurrency' in volo; ritorna le statistiche.
+    Una richiesta conta come errore se la risposta non è 200 o se il job non ha prodotto
+    alcun file di output (verificato con GET /results/{job_id}, fuori dalla latenza misurata).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            resp = await client.post(
+                "/run-agent",
+                files={name: (fname, data) for name, (fname, data) in files.items()},
+                data={"key": key},
+            )
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code != 200:
+                errors += 1
+                return
+            job_id = resp.json().get("job_id")
+            output = await client.get(f"/results/{job_id}", params={"limit": 1}) if job_id else None
+            if output is None or output.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": errors,
+        "throughput_rps": n_requests / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p90_ms": _percentile(latencies, 90) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_loadtest(levels: List[int], n_requests: int, files: Dict[str, Any],
+                       key: str = "", url: str = "") -> List[Dict[str, Any]]:
+    import httpx
+
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=None)
+    else:
+        # server in-process: l'import avviene dopo aver impostato AGENT_REPLAY_FILE
+        import server
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app),
+                                   base_url="http://loadtest", timeout=None)
+    async with client:
+        return [await run_level(client, c, n_requests, files, key) for c in levels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of /run-agent with replayed model calls")
+    parser.add_argument("--replay", help="Recorded run (.jsonl) used by the in-process server")
+    parser.add_argument("--url", default="", help="Target an already running server instead")
+    parser.add_argument("--params", required=True, help="Path to parameter CSV")
+    parser.add_argument("--pdf", required=True, help="Path to PDF")
+    parser.add_argument("--key", default="", help="Optional join key/column name")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    args = parser.parse_args()
+
+    if not args.url:
+        if not args.replay:
+            parser.error("--replay is required without --url")
+        os.environ["AGENT_REPLAY_FILE"] = args.replay
+
+    files = {}
+    for field, path in (("params_file", args.params), ("pdf_file", args.pdf)):
+        with open(path, "rb") as f:
+            files[field] = (os.path.basename(path), f.read())
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    rows = asyncio.run(run_loadtest(levels, args.requests, files, args.key, args.url))
+
+    print(f"{'conc':>5} {'reqs':>5} {'err':>4} {'rps':>8} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9}")
+    for r in rows:
+        print(f"{r['concurrency']:>5} {r['requests']:>5} {r['errors']:>4} {r['throughput_rps']:>8.2f} "
+              f"{r['mean_ms']:>7.1f}ms {r['p50_ms']:>7.1f}ms {r['p90_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Record/replay of agent runs: replay.py
+
+- Registrazione (AGENT_RECORD_DIR): per ogni job di /run-agent gli eventi visti da
+  _event_to_dict (function call, function response, testo finale, usage) vengono
+  salvati in <AGENT_RECORD_DIR>/<job_id>.jsonl; la prima riga contiene il messaggio
+  utente del job.
+- Replay (AGENT_REPLAY_FILE): l'agente usa ReplayLlm, un modello locale che
+  ripropone le stesse function call nello stesso ordine, senza rete. I tool girano
+  davvero; path e handle della registrazione sono riscritti con quelli del job corrente
+  (solo valori identici per intero: i path tra apici del messaggio utente e i campi
+  "handle"/"path" delle function response).
+"""
+import os
+import re
+import json
+import logging
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# Valori tra apici nel messaggio utente (path del job): allineati per posizione al replay
+_QUOTED = re.compile(r"'([^'\n]*)'")
+
+
+def _to_jsonable(value: Any) -> Any:
+    """Converte oggetti pydantic/genai (FunctionCall, Content, ...) in strutture JSON."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+# Campi delle function response che identificano dati del job (handle, file prodotti):
+# sono gli unici riallineati tra registrazione e replay. Colonne, status e valori delle
+# celle non vengono mai usati per riscrivere gli argomenti.
+_REMAP_FIELDS = ("handle", "path")
+
+
+def _rewrite(value: Any, mapping: Dict[str, str]) -> Any:
+    """Sostituisce le stringhe uguali (per intero) a un valore registrato con quello attuale."""
+    if isinstance(value, str):
+        return mapping.get(value, value)
+    if isinstance(value, dict):
+        return {k: _rewrite(v, mapping) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rewrite(v, mapping) for v in value]
+    return value
+
+
+def _pair_fields(recorded: Any, actual: Any, mapping: Dict[str, str]) -> None:
+    """Allinea i campi _REMAP_FIELDS presenti con lo stesso nome in entrambe le response."""
+    if isinstance(recorded, dict) and isinstance(actual, dict):
+        for k, old in recorded.items():
+            if k not in actual:
+                continue
+            new = actual[k]
+            if k in _REMAP_FIELDS and isinstance(old, str) and isinstance(new, str):
+                if old and old != new:
+                    mapping[old] = new
+            else:
+                _pair_fields(old, new, mapping)
+    elif isinstance(recorded, list) and isinstance(actual, list):
+        for old, new in zip(recorded, actual):
+            _pair_fields(old, new, mapping)
+
+
+# -----------------------------------------------------------------------------
+# Registrazione
+# -----------------------------------------------------------------------------
+class EventRecorder:
+    """Scrive in JSONL gli eventi di un job (un oggetto per riga)."""
+
+    def __init__(self, path: str, message: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "w", encoding="utf-8")
+        self._write({"kind": "header", "message": message})
+
+    @classmethod
+    def from_env(cls, job_id: str, message: str) -> Optional["EventRecorder"]:
+        record_dir = os.environ.get("AGENT_RECORD_DIR", "").strip()
+        if not record_dir:
+            return None
+        return cls(os.path.join(record_dir, f"{job_id}.jsonl"), message)
+
+    def _write(self, obj: Dict[str, Any]) -> None:
+        self._f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    def add(self, data: Dict[str, Any], ev: Any = None) -> None:
+        """Registra un evento già serializzato da _event_to_dict (più l'usage, se c'è)."""
+        usage = getattr(ev, "usage_metadata", None)
+        self._write({
+            "kind": "event",
+            "author": data.get("author"),
+            "function_calls": [{"name": fc.get("name"), "args": fc.get("args") or {}}
+                               for fc in _to_jsonable(data.get("function_calls") or [])],
+            "function_responses": [{"name": fr.get("name"), "response": fr.get("response")}
+                                   for fr in _to_jsonable(data.get("function_responses") or [])],
+            "text": data.get("text"),
+            "is_final_response": data.get("is_final_response", False),
+            "usage_metadata": _to_jsonable(usage) if usage is not None else None,
+        })
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    """Ritorna {"message", "model_turns", "responses"} da un file registrato."""
+    message = ""
+    model_turns: List[Dict[str, Any]] = []
+    responses: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if obj.get("kind") == "header":
+                message = obj.get("message", "")
+            elif obj.get("function_responses"):
+                responses.extend(obj["function_responses"])
+            elif obj.get("function_calls") or obj.get("text"):
+                model_turns.append(obj)
+    return {"message": message, "model_turns": model_turns, "responses": responses}
+
+
+# -----------------------------------------------------------------------------
+# Replay
+# -----------------------------------------------------------------------------
+class ReplayLlm(BaseLlm):
+    """
+    Modello stub: al turno k (= numero di turni 'model' già nella richiesta) ripropone
+    il k-esimo turno registrato. Stato per job nessuno: tutto è ricavato da llm_request,
+    quindi un'unica istanza regge richieste concorrenti.
+    """
+
+    model: str = "replay"
+    recording: Dict[str, Any]
+
+    @classmethod
+    def from_file(cls, path: str) -> "ReplayLlm":
+        return cls(recording=load_recording(path))
+
+    def _mapping(self, llm_request: LlmRequest) -> Dict[str, str]:
+        mapping: Dict[str, str] = {}
+        contents = llm_request.contents or []
+        user_texts = [p.text for c in contents if c.role == "user" for p in (c.parts or []) if p.text]
+        if user_texts:
+            for old, new in zip(_QUOTED.findall(self.recording["message"]), _QUOTED.findall(user_texts[0])):
+                if old and old != new:
+                    mapping[old] = new
+        actual = [p.function_response for c in contents for p in (c.parts or []) if p.function_response]
+        for rec, act in zip(self.recording["responses"], actual):
+            _pair_fields(rec.get("response"), _to_jsonable(act.response), mapping)
+        return mapping
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        contents = llm_request.contents or []
+        turn = sum(1 for c in contents if c.role == "model")
+        turns = self.recording["model_turns"]
+        if turn >= len(turns):
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="replay exhausted")]))
+            return
+
+        recorded = turns[turn]
+        mapping = self._mapping(llm_request)
+        parts = [
+            types.Part(function_call=types.FunctionCall(name=fc["name"], args=_rewrite(fc["args"], mapping)))
+            for fc in recorded.get("function_calls", [])
+        ]
+        if not parts:
+            parts = [types.Part(text=_rewrite(recorded.get("text") or "", mapping))]
+        usage = recorded.get("usage_metadata")
+        yield LlmResponse(
+            content=types.Content(role="model", parts=parts),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(**usage) if usage else None,
+        )
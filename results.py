@@ -0,0 +1,67 @@
+"""Paginated access to saved result files: results.py
+
+Le pagine sono lette dalla copia Parquet salvata accanto al CSV (vedi
+save_csv_output): si leggono solo i row group che coprono la pagina richiesta.
+Se la copia Parquet non c'è, si ripiega sulla lettura del CSV.
+"""
+import os
+from typing import Dict, Any, List
+
+import pandas as pd
+
+from agents.pdf_parameter_agent.tools import parquet_sidecar_path
+
+# Limite massimo di righe per pagina
+MAX_PAGE_SIZE = 1000
+
+
+def _parquet_page(path: str, offset: int, limit: int) -> Dict[str, Any]:
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    total = pf.metadata.num_rows
+    columns = pf.schema_arrow.names
+    end = min(total, offset + limit)
+
+    # row group che intersecano [offset, end)
+    groups: List[int] = []
+    first_row = None
+    start = 0
+    for i in range(pf.num_row_groups):
+        n = pf.metadata.row_group(i).num_rows
+        if start < end and start + n > offset:
+            groups.append(i)
+            if first_row is None:
+                first_row = start
+        start += n
+
+    rows: List[Dict[str, Any]] = []
+    if groups:
+        table = pf.read_row_groups(groups)
+        rows = table.slice(offset - first_row, end - offset).to_pylist()
+    return {"total_rows": total, "columns": columns, "rows": rows}
+
+
+def _csv_page(path: str, offset: int, limit: int) -> Dict[str, Any]:
+    try:
+        df = pd.read_csv(path, skiprows=range(1, offset + 1), nrows=limit, dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return {"total_rows": 0, "columns": [], "rows": []}
+    with open(path, "rb") as f:
+        total = max(0, sum(1 for _ in f) - 1)
+    return {"total_rows": total, "columns": list(df.columns), "rows": df.to_dict(orient="records")}
+
+
+def read_result_page(csv_path: str, offset: int = 0, limit: int = 100) -> Dict[str, Any]:
+    """
+    Ritorna una pagina di righe di un file di output:
+        {"total_rows", "offset", "limit", "columns", "rows", "source": "parquet" | "csv"}
+    """
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    parquet_path = parquet_sidecar_path(csv_path)
+    if os.path.exists(parquet_path):
+        page, source = _parquet_page(parquet_path, offset, limit), "parquet"
+    else:
+        page, source = _csv_page(csv_path, offset, limit), "csv"
+    return {"offset": offset, "limit": limit, "source": source, **page}
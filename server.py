@@ -1,13 +1,22 @@
 """This is FastAPI app: server.py
 """
+import io
+import asyncio
 import os
+import json
+import time
 import uuid
 import logging
 import inspect
-from typing import Dict, Any
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from google.adk.agents import RunConfig
@@ -16,6 +25,20 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 from agents.pdf_parameter_agent.agent import processor_agent
+from agents.pdf_parameter_agent.batch import REPORTS_DIRNAME, run_batch
+from agents.pdf_parameter_agent.budget import BUDGET_ACTION_DIRECT, BudgetExceeded, TokenBudget
+from agents.pdf_parameter_agent.handles import release_scope
+from agents.pdf_parameter_agent.pipeline import StageCache, run_report_pipeline
+from blob_store import BlobStore
+from results import read_result_page
+from replay import EventRecorder, ReplayLlm
+
+# Brotli è opzionale: se brotli-asgi è installato si usa (con fallback gzip), altrimenti solo gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+    _BROTLI_AVAILABLE = True
+except Exception:
+    _BROTLI_AVAILABLE = False
 
 # -----------------------------------------------------------------------------
 # (Opzionale) Carica le variabili da .env (GOOGLE_API_KEY, GOOGLE_CLOUD_PROJECT)
@@ -47,12 +70,37 @@ logger = logging.getLogger(__name__)
 WEB_DIR = "web"
 DATA_INPUT_DIR = "data/input"
 DATA_OUTPUT_DIR = "data/output"
+DATA_BLOB_DIR = os.environ.get("DATA_BLOB_DIR", "data/blobs")
 os.makedirs(DATA_INPUT_DIR, exist_ok=True)
 os.makedirs(DATA_OUTPUT_DIR, exist_ok=True)
 
+# Upload deduplicati per contenuto (sha256); i job dir contengono hardlink + manifest
+blob_store = BlobStore(DATA_BLOB_DIR)
+# Retention dei job in data/input e data/output (ore); la GC gira al massimo ogni GC_INTERVAL_SECONDS
+DATA_RETENTION_HOURS = float(os.environ.get("DATA_RETENTION_HOURS", "168"))
+GC_INTERVAL_SECONDS = 3600
+_last_gc = 0.0
+_gc_task: Optional[asyncio.Task] = None
+# Output memoizzati degli stage della pipeline diretta (stessa retention dei job)
+stage_cache = StageCache()
+JOB_STATUS_NAME = "status.json"
+
 # Statici sotto /static (non montare su "/")
 app.mount("/static", StaticFiles(directory=WEB_DIR), name="static")
 
+# Replay offline (AGENT_REPLAY_FILE): l'agente usa un modello stub che ripropone
+# le function call registrate (vedi replay.py); altrimenti il modello reale
+AGENT_REPLAY_FILE = os.environ.get("AGENT_REPLAY_FILE", "").strip()
+if AGENT_REPLAY_FILE:
+    run_agent_obj = processor_agent.model_copy(update={"model": ReplayLlm.from_file(AGENT_REPLAY_FILE)})
+    logger.info("🔁 Replay da %s (nessuna chiamata al modello)", AGENT_REPLAY_FILE)
+else:
+    run_agent_obj = processor_agent
+
+# Budget token/chiamate per job (AGENT_* in budget.py): validato una volta all'avvio,
+# una configurazione non valida impedisce l'avvio invece di far fallire ogni richiesta
+AGENT_BUDGET_CONFIG = TokenBudget.config_from_env()
+
 # Constants for Message Keys
 SUPPORTED_MSG_KEYS = ("message", "input", "prompt", "text", "query", "content")
 
@@ -74,6 +122,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressione delle risposte (JSON, CSV) oltre COMPRESS_MIN_SIZE byte
+COMPRESS_MIN_SIZE = 1024
+if _BROTLI_AVAILABLE:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE)
+
 @app.on_event("startup")
 async def startup_event():
     """StartUp. logging some info.
@@ -82,6 +137,8 @@ async def startup_event():
     logger.info("🌍 Endpoint: http://localhost:8000/run-agent")
     logger.info("📁 Input directory: %s", os.path.abspath(DATA_INPUT_DIR))
     logger.info("📁 Output directory: %s", os.path.abspath(DATA_OUTPUT_DIR))
+    logger.info("📁 Blob directory: %s", os.path.abspath(DATA_BLOB_DIR))
+    _maybe_gc()
 
 @app.get("/ping")
 async def ping():
@@ -95,6 +152,30 @@ async def ping():
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
+def _run_gc(now: float) -> None:
+    """Retention su input/output/blob e sulla cache degli stage (I/O bloccante: gira in un thread)."""
+    try:
+        blob_store.gc(DATA_INPUT_DIR, DATA_OUTPUT_DIR, DATA_RETENTION_HOURS * 3600, now=now)
+        stage_cache.prune(DATA_RETENTION_HOURS * 3600, now=now)
+    except Exception as ex:
+        logger.warning("GC fallita (proseguo): %s", ex)
+
+
+def _maybe_gc() -> None:
+    """
+    Avvia la GC al massimo una volta ogni GC_INTERVAL_SECONDS, in background sul
+    threadpool: né l'event loop né la richiesta corrente ne attendono la fine.
+    Va chiamata dall'event loop (startup e handler async).
+    """
+    global _last_gc, _gc_task
+    now = time.time()
+    if now - _last_gc < GC_INTERVAL_SECONDS:
+        return
+    _last_gc = now
+    # il riferimento al task evita che venga raccolto prima di terminare
+    _gc_task = asyncio.get_running_loop().create_task(run_in_threadpool(_run_gc, now))
+
+
 def _event_to_dict(ev) -> Dict[str, Any]:
     """
     Serializza i campi utili degli Event ADK:
@@ -135,6 +216,20 @@ def _event_to_dict(ev) -> Dict[str, Any]:
     return data
 
 
+def _run_direct(params_path: str, pdf_path: str, output_dir: str, key: str = "") -> Dict[str, Any]:
+    """
+    Percorso diretto (senza LLM): pipeline incrementale estrazione → join → salvataggio.
+    Ritorna {"path", "rows", "stages"}; gli stage con input invariati risultano "skipped".
+    """
+    return run_report_pipeline(params_path, pdf_path, os.path.join(output_dir, "result.csv"), key or None)
+
+
+def _write_job_status(job_output_dir: str, status: Dict[str, Any]) -> None:
+    """Salva lo stato del job (modalità, stage eseguiti/saltati, usage) in status.json."""
+    with open(os.path.join(job_output_dir, JOB_STATUS_NAME), "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2)
+
+
 async def iter_runner_events(runner, user_id: str, session_id: str, message: str):
     """Esegue runner.run_async in modo compatibile con diverse versioni di google-adk.
     Ordine dei tentativi:
@@ -266,13 +361,15 @@ async def iter_runner_events(runner, user_id: str, session_id: str, message: str
 @app.post("/run-agent")
 async def run_agent(params_file: UploadFile = File(...),
                     pdf_file: UploadFile = File(...),
-                    key: str = Form(default="")):
+                    key: str = Form(default=""),
+                    mode: str = Form(default="agent")):
     """Run the Agent passing the right set of parameters
 
     Args:
         params_file (UploadFile, optional): CSV files with mapping. Defaults to File(...).
         pdf_file (UploadFile, optional): PDF file containing PenTests results. Defaults to File(...).
         key (str, optional): _description_. Defaults to Form(default="").
+        mode (str, optional): "agent" (LLM) or "direct" (incremental pipeline, no LLM). Defaults to "agent".
 
     Raises:
         HTTPException: raised in case of HTTP errors
@@ -283,6 +380,8 @@ async def run_agent(params_file: UploadFile = File(...),
     logger.info("▶️ run-agent: richiesta ricevuta")
 
     # --- 1) Validazioni -------------------------------------------------------
+    if mode not in ("agent", "direct"):
+        raise HTTPException(status_code=400, detail="mode deve essere 'agent' o 'direct'")
     # Accetta .csv o .json per i parametri (SE vuoi solo CSV:
     #   cambia la condizione in: if params_ext != ".csv": ... )
     params_ext = os.path.splitext(params_file.filename)[1].lower()
@@ -301,38 +400,57 @@ async def run_agent(params_file: UploadFile = File(...),
     os.makedirs(job_input_dir, exist_ok=True)
     os.makedirs(job_output_dir, exist_ok=True)
 
-    params_path = os.path.join(job_input_dir, params_file.filename)
-    pdf_path = os.path.join(job_input_dir, pdf_file.filename)
-
-    params_path_n = params_path.replace("\\", "/")
-    pdf_path_n = pdf_path.replace("\\", "/")
-    job_output_dir_n = job_output_dir.replace("\\", "/")
-
     try:
         csv_bytes = await params_file.read()
         pdf_bytes = await pdf_file.read()
         content_csv = csv_bytes.decode("utf-8")     # OK
         content_pdf = pdf_bytes                     # PDF → binario
-        with open(params_path, "wb") as f:
-            f.write(csv_bytes)
-        with open(pdf_path, "wb") as f:
-            f.write(pdf_bytes)
+        # Blob indirizzati per contenuto: un upload già visto non viene riscritto
+        params_entry = blob_store.add_job_file(job_id, job_input_dir, "params",
+                                               params_file.filename, csv_bytes)
+        pdf_entry = blob_store.add_job_file(job_id, job_input_dir, "pdf",
+                                            pdf_file.filename, pdf_bytes)
     finally:
         await params_file.close()
         await pdf_file.close()
-    logger.info("💾 Salvati: %s | %s", params_path_n, pdf_path_n)
+
+    params_path_n = params_entry["path"].replace("\\", "/")
+    pdf_path_n = pdf_entry["path"].replace("\\", "/")
+    job_output_dir_n = job_output_dir.replace("\\", "/")
+    logger.info("💾 Salvati: %s | %s (cache hit: %s | %s)", params_path_n, pdf_path_n,
+                params_entry["cached"], pdf_entry["cached"])
+    _maybe_gc()
     logger.info("📂 Output previsto: %s", job_output_dir_n)
 
-    # --- 3) Prompt di tasking per l'agente -----------------------------------
+    # --- 3) Percorso diretto: ricalcola solo gli stage a valle di ciò che è cambiato
+    if mode == "direct":
+        try:
+            direct = await run_in_threadpool(_run_direct, params_entry["path"], pdf_entry["path"],
+                                             job_output_dir, key)
+        except Exception as e:
+            logger.exception("❌ Errore durante l'esecuzione della pipeline diretta")
+            raise HTTPException(status_code=500, detail=f"Errore pipeline:{e}") from e
+        status = {"job_id": job_id, "mode": "direct", "response": direct["path"],
+                  "rows": direct["rows"], "stages": direct["stages"]}
+        _write_job_status(job_output_dir, status)
+        return status
+
+    # --- 3b) Prompt di tasking per l'agente ----------------------------------
     message = (
-        "Fondi la tabella parametri con le due tabelle del PDF e salva un CSV.\n"
-        f"- load_parameter_table(params_path_n='{params_path_n}')\n"
-        f"- extract_pdf_tables(pdf_path_n='{pdf_path_n}')\n"
-        f"- combine_and_match(params_path_n='{params_path_n},pdf_path_n='{pdf_path_n},{key})\n"
-        f"- save_csv_output(output_dir='{job_output_dir_n}')\n"
+        "Fondi la tabella parametri con la tabella del PDF e salva un CSV.\n"
+        f"- load_parameter_table_handle(file_path='{params_path_n}')\n"
+        f"- extract_pdf_table_handle(pdf_path='{pdf_path_n}')\n"
+        f"- combine_and_match_handles(param_handle, pdf_handle, key='{key}')\n"
+        f"- save_csv_output_handle(records_handle, output_path='{job_output_dir_n}/result.csv')\n"
         f"Chiave opzionale: '{key}'."
     )
     logger.info("Message: %s", message)
+
+    # --- 4) Budget token/chiamate del job (vedi AGENT_* in budget.py) ----------
+    budget = TokenBudget(**AGENT_BUDGET_CONFIG)
+    # Registrazione eventi per il replay (solo se AGENT_RECORD_DIR è impostata)
+    recorder = EventRecorder.from_env(job_id, message)
+    session = None
     try:
        # Avvia una sessione e passa i contenuti nello 'state'
         session = await session_service.create_session(
@@ -340,20 +458,48 @@ async def run_agent(params_file: UploadFile = File(...),
             user_id="web",
             state={"file1_data": content_csv, "file2_data": content_pdf}
         )
-        runner = Runner(agent=processor_agent, app_name="agents", session_service=session_service)
+        runner = Runner(agent=run_agent_obj, app_name="agents", session_service=session_service)
         content = types.Content(role='user', parts=[types.Part(text=message)])
         # Esegui l'agente
         response_text = ""
+        over_budget = None
         events = runner.run_async(session_id=session.id, user_id="web", new_message=content)
         async for eve in events:
+            if recorder is not None:
+                recorder.add(_event_to_dict(eve), eve)
+            budget.add_event(eve)
+            over_budget = budget.exceeded()
+            if over_budget:
+                break
             if eve.is_final_response():
                 #if eve.content and eve.content.parts:
                 response_text = eve.content.parts[0].text
 
-        return {"response": response_text}
+        if over_budget:
+            await events.aclose()
+            logger.warning("💸 Job %s: %s (azione: %s)", job_id, over_budget, budget.action)
+            if budget.action != BUDGET_ACTION_DIRECT:
+                raise BudgetExceeded(over_budget)
+            direct = await run_in_threadpool(_run_direct, params_entry["path"], pdf_entry["path"],
+                                             job_output_dir, key)
+            status = {"job_id": job_id, "mode": "direct", "response": direct["path"],
+                      "rows": direct["rows"], "stages": direct["stages"],
+                      "reason": over_budget, "usage": budget.as_dict()}
+        else:
+            status = {"job_id": job_id, "mode": "agent", "response": response_text, "usage": budget.as_dict()}
+        _write_job_status(job_output_dir, status)
+        return status
+    except BudgetExceeded as e:
+        raise HTTPException(status_code=429, detail=f"Budget agente superato: {e}") from e
     except Exception as e:
         logger.exception("❌ Errore durante l'esecuzione dell'agente ADK (Runner)")
         raise HTTPException(status_code=500, detail=f"Errore agente:{e}") from e
+    finally:
+        if recorder is not None:
+            recorder.close()
+        # i record dietro agli handle del job non servono più (vedi handles.py)
+        if session is not None:
+            release_scope(session.id)
 
 
 
@@ -380,4 +526,216 @@ async def run_agent(params_file: UploadFile = File(...),
     #     "events": events[-50:]  # limito la risposta
     # }
     # return JSONResponse(content=payload, status_code=200)
-    
\ No newline at end of file
+    
+
+
+# -----------------------------------------------------------------------------
+# Risultati: accesso paginato e download dei file di output di un job
+# -----------------------------------------------------------------------------
+def _result_file(job_id: str, file: str = "") -> str:
+    """
+    Path del CSV di output del job (default: combined.csv, poi result.csv, poi il primo CSV).
+    Un 'file' esplicito è cercato nella cartella del job e poi in reports/ (report del batch).
+    """
+    if not job_id.isalnum():
+        raise HTTPException(status_code=400, detail="job_id non valido")
+    job_output_dir = os.path.join(DATA_OUTPUT_DIR, job_id)
+    if not os.path.isdir(job_output_dir):
+        raise HTTPException(status_code=404, detail=f"Job non trovato: {job_id}")
+    if file:
+        name = os.path.basename(file)
+        candidates = [name, os.path.join(REPORTS_DIRNAME, name)]
+    else:
+        csvs = sorted(f for f in os.listdir(job_output_dir) if f.lower().endswith(".csv"))
+        candidates = [f for f in ("combined.csv", "result.csv") if f in csvs] + csvs
+    for name in candidates:
+        path = os.path.join(job_output_dir, name)
+        if name.lower().endswith(".csv") and os.path.isfile(path):
+            return path
+    raise HTTPException(status_code=404, detail=f"Nessun file di output per il job {job_id}")
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status of a finished job: mode, usage and, on the direct path, computed/skipped stages."""
+    if not job_id.isalnum():
+        raise HTTPException(status_code=400, detail="job_id non valido")
+    path = os.path.join(DATA_OUTPUT_DIR, job_id, JOB_STATUS_NAME)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"Job non trovato: {job_id}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@app.get("/results/{job_id}")
+async def get_result_rows(job_id: str, file: str = "", offset: int = 0, limit: int = 100):
+    """Paginated rows of a job output file.
+
+    Args:
+        job_id (str): job identifier returned by /run-agent or /run-batch.
+        file (str, optional): output CSV name. Defaults to the main result file.
+        offset (int, optional): first row (0-based). Defaults to 0.
+        limit (int, optional): rows per page (max results.MAX_PAGE_SIZE). Defaults to 100.
+
+    Returns:
+        json: {"job_id", "file", "total_rows", "offset", "limit", "columns", "rows", "source"}
+    """
+    path = _result_file(job_id, file)
+    page = await run_in_threadpool(read_result_page, path, offset, limit)
+    return {"job_id": job_id, "file": os.path.basename(path), **page}
+
+
+@app.get("/results/{job_id}/download")
+async def download_result(job_id: str, file: str = ""):
+    """Download a job output CSV (compressed in transit by the middleware)."""
+    path = _result_file(job_id, file)
+    return FileResponse(path, media_type="text/csv", filename=os.path.basename(path))
+
+
+# -----------------------------------------------------------------------------
+# Endpoint batch: una tabella parametri, molti PDF (percorso diretto, senza LLM)
+# -----------------------------------------------------------------------------
+# Worker del pool condiviso per i batch (0/non impostato = numero di CPU)
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", "0")) or None
+# Limiti sugli archivi .zip del batch (difesa da zip bomb): numero di voci,
+# dimensione non compressa del singolo PDF e dell'intero archivio
+BATCH_ZIP_MAX_ENTRIES = int(os.environ.get("BATCH_ZIP_MAX_ENTRIES", "1000"))
+BATCH_ZIP_MAX_FILE_MB = float(os.environ.get("BATCH_ZIP_MAX_FILE_MB", "200"))
+BATCH_ZIP_MAX_TOTAL_MB = float(os.environ.get("BATCH_ZIP_MAX_TOTAL_MB", "1024"))
+_batch_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    """Process pool condiviso tra le richieste batch, creato alla prima richiesta."""
+    global _batch_pool
+    if _batch_pool is None:
+        _batch_pool = ProcessPoolExecutor(max_workers=BATCH_MAX_WORKERS)
+    return _batch_pool
+
+
+def _discard_batch_pool(pool: ProcessPoolExecutor) -> None:
+    """Scarta un pool rotto (worker morto): la prossima richiesta ne crea uno nuovo."""
+    global _batch_pool
+    if _batch_pool is pool:  # una richiesta concorrente può averlo già sostituito
+        _batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Shutdown. Chiude il process pool dei batch."""
+    if _batch_pool is not None:
+        _batch_pool.shutdown(cancel_futures=True)
+
+
+def _iter_batch_pdfs(filename: str, data: bytes):
+    """
+    Ritorna (nome, bytes) dei PDF caricati: il file stesso o i .pdf contenuti in uno .zip.
+    Gli archivi oltre i limiti BATCH_ZIP_* vengono rifiutati prima di decomprimere.
+    """
+    if filename.lower().endswith(".pdf"):
+        yield os.path.basename(filename), data
+        return
+    if not filename.lower().endswith(".zip"):
+        raise HTTPException(status_code=400, detail=f"File non supportato nel batch: {filename}")
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            infos = zf.infolist()
+            if len(infos) > BATCH_ZIP_MAX_ENTRIES:
+                raise HTTPException(status_code=413,
+                                    detail=f"Troppi file nell'archivio {filename} (max {BATCH_ZIP_MAX_ENTRIES})")
+            pdf_infos = [i for i in infos
+                         if not i.is_dir() and i.filename.lower().endswith(".pdf")]
+            # file_size è dichiarato nell'header: zipfile non legge oltre e verifica il CRC
+            for info in pdf_infos:
+                if info.file_size > BATCH_ZIP_MAX_FILE_MB * 1024 * 1024:
+                    raise HTTPException(status_code=413,
+                                        detail=f"{info.filename} in {filename} supera {BATCH_ZIP_MAX_FILE_MB} MB")
+            if sum(i.file_size for i in pdf_infos) > BATCH_ZIP_MAX_TOTAL_MB * 1024 * 1024:
+                raise HTTPException(status_code=413,
+                                    detail=f"Archivio {filename} oltre {BATCH_ZIP_MAX_TOTAL_MB} MB decompresso")
+            for info in pdf_infos:
+                # solo il nome base: i path interni allo zip non vengono mai usati su disco
+                yield os.path.basename(info.filename), zf.read(info)
+    except zipfile.BadZipFile as ex:
+        raise HTTPException(status_code=400, detail=f"Archivio zip non valido: {filename}") from ex
+
+
+def _unique_batch_name(name: str, seen: set) -> str:
+    """
+    Nome univoco (case-insensitive) nel job dir per un PDF del batch: lo stesso nome
+    può arrivare da zip/upload diversi. Registra il nome scelto in 'seen'.
+    """
+    unique, n = name, 0
+    while unique.lower() in seen:
+        n += 1
+        unique = f"{n}_{name}"
+    seen.add(unique.lower())
+    return unique
+
+
+@app.post("/run-batch")
+async def run_batch_endpoint(params_file: UploadFile = File(...),
+                             pdf_files: List[UploadFile] = File(...),
+                             key: str = Form(default=""),
+                             title: str = Form(default="")):
+    """Run many reports against the same parameter table (direct path, no LLM).
+
+    Args:
+        params_file (UploadFile): CSV/XLSX parameter table, parsed once for the whole batch.
+        pdf_files (List[UploadFile]): PDF reports, or .zip archives containing PDFs.
+        key (str, optional): join key column. Defaults to "Assets".
+        title (str, optional): title of the table to extract. Defaults to the tool default.
+
+    Raises:
+        HTTPException: raised in case of invalid inputs or processing errors
+
+    Returns:
+        json: per-report outputs and the combined, deduplicated result file
+    """
+    logger.info("▶️ run-batch: richiesta ricevuta (%d file)", len(pdf_files))
+
+    params_ext = os.path.splitext(params_file.filename)[1].lower()
+    if params_ext not in (".csv", ".xlsx"):
+        raise HTTPException(status_code=400, detail="Il file dei parametri deve essere .csv o .xlsx")
+
+    job_id = uuid.uuid4().hex[:8]
+    job_input_dir = os.path.join(DATA_INPUT_DIR, job_id)
+    job_output_dir = os.path.join(DATA_OUTPUT_DIR, job_id)
+    os.makedirs(job_output_dir, exist_ok=True)
+
+    pdf_paths: List[str] = []
+    try:
+        params_entry = blob_store.add_job_file(job_id, job_input_dir, "params",
+                                               params_file.filename, await params_file.read())
+        seen = set()
+        for upload in pdf_files:
+            for name, data in _iter_batch_pdfs(upload.filename, await upload.read()):
+                unique = _unique_batch_name(name, seen)
+                entry = blob_store.add_job_file(job_id, job_input_dir, f"pdf:{unique}", unique, data)
+                pdf_paths.append(entry["path"])
+    finally:
+        await params_file.close()
+        for upload in pdf_files:
+            await upload.close()
+    _maybe_gc()
+
+    if not pdf_paths:
+        raise HTTPException(status_code=400, detail="Nessun PDF nel batch")
+
+    pool = _get_batch_pool()
+    try:
+        result = await run_in_threadpool(run_batch, params_entry["path"], pdf_paths, job_output_dir,
+                                         key=key or None, title=title or None,
+                                         executor=pool, cache=stage_cache)
+    except BrokenProcessPool as e:
+        logger.error("❌ Process pool del batch rotto (worker terminato): lo ricreo")
+        _discard_batch_pool(pool)
+        raise HTTPException(status_code=503,
+                            detail="Un worker del batch è terminato in modo anomalo "
+                                   "(es. memoria esaurita); riprovare la richiesta") from e
+    except Exception as e:
+        logger.exception("❌ Errore durante l'esecuzione del batch")
+        raise HTTPException(status_code=500, detail=f"Errore batch:{e}") from e
+
+    return {"job_id": job_id, **result}
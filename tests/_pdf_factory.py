@@ -0,0 +1,63 @@
+"""Minimal PDF writer used by tests (one text line per entry, one page per list)."""
+from typing import List, Optional
+
+
+def _escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _table_ops(rows: List[List[str]], top: float = 600, cell_w: float = 150, cell_h: float = 20) -> str:
+    """Content-stream operators drawing a ruled table (grid lines + cell text)."""
+    n_rows, n_cols = len(rows), max(len(r) for r in rows)
+    ops = ["0.5 w"]
+    for i in range(n_rows + 1):
+        y = top - i * cell_h
+        ops.append(f"50 {y} m {50 + n_cols * cell_w} {y} l S")
+    for j in range(n_cols + 1):
+        x = 50 + j * cell_w
+        ops.append(f"{x} {top} m {x} {top - n_rows * cell_h} l S")
+    for i, row in enumerate(rows):
+        for j, cell in enumerate(row):
+            ops.append(f"BT /F1 10 Tf {55 + j * cell_w} {top - (i + 1) * cell_h + 6} Td ({_escape(cell)}) Tj ET")
+    return " ".join(ops)
+
+
+def make_pdf(path: str, pages: List[List[str]], tables: Optional[dict] = None) -> str:
+    """
+    Write a PDF with the given text lines on each page and return its path.
+    'tables' maps a page index to table rows (first row = header) drawn below the text.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page_no, lines in enumerate(pages):
+        stream = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(
+            f"({_escape(l)}) Tj T*" for l in lines
+        ) + " ET"
+        if tables and page_no in tables:
+            stream += " " + _table_ops(tables[page_no])
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream".encode("latin-1"))
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+    return path
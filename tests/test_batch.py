@@ -0,0 +1,141 @@
+import csv
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from agents.pdf_parameter_agent.batch import _combine_reports, run_batch
+from tests._pdf_factory import make_pdf
+
+TITLE = "Disclosed Vulnerabilities for legacy findings"
+
+
+def _crash_worker(*args):
+    os._exit(1)  # worker che muore (come un OOM kill)
+
+
+def test_combine_reports_deduplicates_and_tracks_sources():
+    results = [
+        {"pdf": "/x/q1.pdf", "records": [{"Assets": "A01", "Severity": "High"},
+                                         {"Assets": "A02", "Severity": "Low"}]},
+        {"pdf": "/x/q2.pdf", "records": [{"Assets": "A01", "Severity": "High"}]},
+    ]
+    combined = _combine_reports(results)
+    assert combined == [
+        {"Assets": "A01", "Severity": "High", "source_pdf": "q1.pdf;q2.pdf"},
+        {"Assets": "A02", "Severity": "Low", "source_pdf": "q1.pdf"},
+    ]
+
+
+def test_run_batch_reuses_one_parameter_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # cache degli stage (data/cache) nella cartella del test
+    params = tmp_path / "params.csv"
+    params.write_text("Assets,Reference Squad,Product Owner\nA01,TeamX,Marco\nA02,TeamY,Giulia\n")
+    header = ["Severity", "Assets", "Description"]
+    pdfs = []
+    for name, rows in (("q1", [["High", "A01", "Old TLS"]]),
+                       ("combined", [["Low", "A02", "Banner"]]),
+                       ("q2", [["High", "A01", "Old TLS"], ["Low", "A02", "Banner"]])):
+        pdfs.append(make_pdf(str(tmp_path / f"{name}.pdf"), [[TITLE]], tables={0: [header] + rows}))
+    pdfs.append(make_pdf(str(tmp_path / "broken.pdf"), [["no title here"]]))
+
+    out_dir = str(tmp_path / "out")
+    result = run_batch(str(params), pdfs, out_dir, key="Assets", title=TITLE, max_workers=2)
+
+    statuses = {os.path.basename(r["pdf"]): r["status"] for r in result["reports"]}
+    assert statuses == {"q1.pdf": "success", "combined.pdf": "success",
+                        "q2.pdf": "success", "broken.pdf": "error"}
+    assert os.path.exists(os.path.join(out_dir, "reports", "q2.csv"))
+    # il report di "combined.pdf" non collide con il file combinato
+    report_paths = {r["path"] for r in result["reports"] if r["status"] == "success"}
+    assert result["combined"]["path"] not in report_paths
+
+    with open(result["combined"]["path"], newline="") as f:
+        combined = list(csv.DictReader(f))
+    assert result["combined"]["rows"] == 2
+    by_asset = {r["Assets"]: r for r in combined}
+    assert by_asset["A01"]["source_pdf"] == "q1.pdf;q2.pdf"
+    assert by_asset["A02"]["source_pdf"] == "combined.pdf;q2.pdf"
+    assert by_asset["A02"]["csv_Product Owner"] == "Giulia"
+
+
+def test_run_batch_keeps_custom_join_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    params = tmp_path / "params.csv"
+    params.write_text("Host,Product Owner\nsrv1,Marco\n")
+    header = ["Severity", "Host", "Description"]
+    pdf = make_pdf(str(tmp_path / "q1.pdf"), [[TITLE]],
+                   tables={0: [header, ["High", "srv1", "Old TLS"]]})
+
+    result = run_batch(str(params), [pdf], str(tmp_path / "out"), key="Host", title=TITLE, max_workers=1)
+
+    assert result["combined"]["rows"] == 1
+    with open(result["combined"]["path"], newline="") as f:
+        row = next(csv.DictReader(f))
+    assert row["Host"] == "srv1" and row["csv_Product Owner"] == "Marco"
+
+
+def test_run_batch_case_insensitive_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    params = tmp_path / "params.csv"
+    params.write_text("Assets,Owner\na01,Marco\n")
+    pdf = make_pdf(str(tmp_path / "q1.pdf"), [[TITLE]],
+                   tables={0: [["Severity", "Assets", "Description"], ["High", "A01", "Old TLS"]]})
+
+    result = run_batch(str(params), [pdf], str(tmp_path / "out"), key="Assets",
+                       case_insensitive=True, title=TITLE, max_workers=1)
+
+    assert result["reports"][0]["rows"] == 1
+    assert result["combined"]["rows"] == 1
+
+
+def test_run_batch_submits_only_the_index_key(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from agents.pdf_parameter_agent import batch
+    from agents.pdf_parameter_agent.pipeline import StageCache
+
+    monkeypatch.chdir(tmp_path)
+    params = tmp_path / "params.csv"
+    params.write_text("Assets,Owner\nA01,Marco\n")
+    header = ["Severity", "Assets", "Description"]
+    pdfs = [make_pdf(str(tmp_path / f"q{i}.pdf"), [[TITLE]], tables={0: [header, ["High", "A01", f"d{i}"]]})
+            for i in range(3)]
+
+    submitted, loads = [], []
+    real_get = StageCache.get
+
+    def counting_get(self, stage, key):
+        value = real_get(self, stage, key)
+        if stage == "batch_join_index":
+            loads.append(key)
+        return value
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, *args, **kwargs):
+            submitted.append(args)
+            return super().submit(fn, *args, **kwargs)
+
+    monkeypatch.setattr(StageCache, "get", counting_get)
+    monkeypatch.setattr(batch, "_worker_index", {})
+    with RecordingExecutor(max_workers=2) as executor:
+        result = run_batch(str(params), pdfs, str(tmp_path / "out"), key="Assets", title=TITLE,
+                           executor=executor, cache=StageCache(str(tmp_path / "cache")))
+
+    assert result["combined"]["rows"] == 3
+    # nei task c'è la chiave dell'indice, mai l'indice stesso
+    assert all(not isinstance(a, dict) for args in submitted for a in args)
+    # un solo caricamento dalla cache per processo (qui: un solo processo)
+    assert len(loads) == 1
+
+
+def test_run_batch_propagates_broken_pool(tmp_path, monkeypatch):
+    from agents.pdf_parameter_agent import batch
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(batch, "_process_report_by_index_key", _crash_worker)
+    params = tmp_path / "params.csv"
+    params.write_text("Assets,Owner\nA01,Marco\n")
+    pdf = make_pdf(str(tmp_path / "q1.pdf"), [[TITLE]])
+
+    with pytest.raises(BrokenProcessPool):
+        run_batch(str(params), [pdf], str(tmp_path / "out"), title=TITLE, max_workers=1)
@@ -0,0 +1,46 @@
+import json
+import os
+
+from blob_store import BlobStore
+
+
+def test_duplicate_upload_is_deduplicated(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = store.add_job_file("job1", str(tmp_path / "input" / "job1"), "pdf", "report.pdf", b"%PDF data")
+    second = store.add_job_file("job2", str(tmp_path / "input" / "job2"), "pdf", "report.pdf", b"%PDF data")
+
+    assert first["cached"] is False and second["cached"] is True
+    assert first["blob"] == second["blob"]
+    assert os.path.samefile(first["path"], second["path"])
+    assert store.refcount(first["blob"]) == 2
+
+
+def _set_created_at(job_dir, ts):
+    path = os.path.join(job_dir, "manifest.json")
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest["created_at"] = ts
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+def test_gc_removes_expired_jobs_and_unreferenced_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    input_dir, output_dir = str(tmp_path / "input"), str(tmp_path / "output")
+    old_dir, new_dir = os.path.join(input_dir, "old"), os.path.join(input_dir, "new")
+    only_old = store.add_job_file("old", old_dir, "pdf", "a.pdf", b"only old")
+    shared = store.add_job_file("old", old_dir, "params", "p.csv", b"shared")
+    store.add_job_file("new", new_dir, "params", "p.csv", b"shared")
+    os.makedirs(os.path.join(output_dir, "old"))
+    os.utime(os.path.join(output_dir, "old"), (1000, 1000))
+    os.utime(only_old["blob"], (1000, 1000))
+    _set_created_at(old_dir, 1000)
+    _set_created_at(new_dir, 5000)
+
+    stats = store.gc(input_dir, output_dir, retention_seconds=60, now=5030)
+
+    assert stats == {"jobs": 2, "blobs": 1}
+    assert not os.path.exists(old_dir)
+    assert not os.path.exists(os.path.join(output_dir, "old"))
+    assert not os.path.exists(only_old["blob"])
+    assert os.path.exists(shared["blob"]) and store.refcount(shared["blob"]) == 1
@@ -0,0 +1,73 @@
+import pytest
+
+from agents.pdf_parameter_agent.budget import TokenBudget
+from agents.pdf_parameter_agent.handles import get_records, put_records
+from agents.pdf_parameter_agent.tools import combine_and_match_handles, save_csv_output_handle
+
+
+class _Usage:
+    def __init__(self, prompt, candidates):
+        self.prompt_token_count = prompt
+        self.candidates_token_count = candidates
+        self.total_token_count = prompt + candidates
+
+
+class _Event:
+    def __init__(self, usage=None):
+        self.usage_metadata = usage
+
+
+def test_tools_exchange_compact_handles(tmp_path):
+    params = put_records([{"Assets": "A01", "Owner": "Marco"}], prefix="params")
+    pdf = put_records([{"Severity": "High", "Assets": "A01"}, {"Severity": "Low", "Assets": "A02"}], prefix="pdf")
+    assert pdf["record_count"] == 2 and pdf["columns"] == ["Severity", "Assets"]
+
+    merged = combine_and_match_handles(params["handle"], pdf["handle"], key="Assets")
+    assert set(merged) == {"handle", "record_count", "columns"}
+    assert get_records(merged["handle"]) == [{"Severity": "High", "Assets": "A01", "csv_Assets": "A01", "csv_Owner": "Marco"}]
+
+    saved = save_csv_output_handle(merged["handle"], str(tmp_path / "out" / "result.csv"))
+    assert saved["status"] == "success"
+
+    with pytest.raises(KeyError):
+        get_records("pdf_unknown")
+
+
+def test_token_budget_counts_usage_and_limits():
+    budget = TokenBudget(max_total_tokens=150, max_llm_calls=5)
+    budget.add_event(_Event(_Usage(80, 20)))
+    budget.add_event(_Event())  # eventi senza usage (es. tool response) non contano
+    assert budget.exceeded() is None
+    budget.add_event(_Event(_Usage(40, 10)))
+    assert budget.as_dict()["total_tokens"] == 150 and budget.llm_calls == 2
+    budget.add_event(_Event(_Usage(1, 0)))
+    assert "token budget exceeded" in budget.exceeded()
+
+
+def test_token_budget_from_env(monkeypatch):
+    monkeypatch.setenv("AGENT_MAX_LLM_CALLS", "3")
+    monkeypatch.setenv("AGENT_BUDGET_ACTION", "direct")
+    budget = TokenBudget.from_env()
+    assert budget.max_total_tokens is None and budget.max_llm_calls == 3 and budget.action == "direct"
+
+
+@pytest.mark.parametrize("name,value", [("AGENT_MAX_TOTAL_TOKENS", "10k"),
+                                        ("AGENT_MAX_LLM_CALLS", "-1"),
+                                        ("AGENT_BUDGET_ACTION", "stop")])
+def test_token_budget_config_rejects_invalid_env(monkeypatch, name, value):
+    monkeypatch.setenv(name, value)
+    with pytest.raises(ValueError, match=name):
+        TokenBudget.config_from_env()
+
+
+def test_handles_scoped_per_job_survive_shared_eviction(monkeypatch):
+    from agents.pdf_parameter_agent import handles
+    monkeypatch.setattr(handles, "MAX_CACHED_RESULTS", 2)
+    job = put_records([{"Assets": "J01"}], prefix="pdf", scope="session-a")
+    for i in range(5):  # altri job/uso diretto riempiono la cache condivisa
+        put_records([{"Assets": f"X{i}"}])
+
+    assert get_records(job["handle"], scope="session-a") == [{"Assets": "J01"}]
+    handles.release_scope("session-a")
+    with pytest.raises(KeyError):
+        get_records(job["handle"], scope="session-a")
@@ -0,0 +1,62 @@
+from openpyxl import Workbook
+
+from agents.pdf_parameter_agent.tools import (
+    build_join_index,
+    combine_and_match,
+    iter_parameter_rows,
+    load_parameter_table,
+)
+
+
+def _make_workbook(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Other"
+    ws.append(["ignored"])
+    ws = wb.create_sheet("CMDB")
+    ws.append(["Assets", "Reference Squad", "Product Owner", "Notes"])
+    ws.append(["A01", "TeamX", "Marco", "n1"])
+    ws.append([None, None, None, None])
+    ws.append(["A02", "TeamY", "Giulia", "n2"])
+    ws.append(["A03", "TeamZ", "Luca", "n3"])
+    wb.save(path)
+    return str(path)
+
+
+def test_xlsx_streaming_sheet_projection_and_limit(tmp_path):
+    path = _make_workbook(tmp_path / "params.xlsx")
+
+    out = load_parameter_table(path, sheet_name="CMDB",
+                               columns=["Assets", "Product Owner"], max_rows=2,
+                               with_metadata=True)
+    assert out["records"] == [
+        {"Assets": "A01", "Product Owner": "Marco"},
+        {"Assets": "A02", "Product Owner": "Giulia"},
+    ]
+    meta = out["metadata"]
+    assert meta["format"] == "xlsx" and meta["sheet"] == "CMDB"
+    assert meta["rows"] == 2 and meta["large_workbook"] is False
+
+
+def test_join_index_from_streamed_rows(tmp_path):
+    path = _make_workbook(tmp_path / "params.xlsx")
+    index = build_join_index(iter_parameter_rows(path, sheet_name="CMDB"), key="Assets")
+    assert sorted(index) == ["A01", "A02", "A03"]
+
+    pdf_rows = [{"Assets": " A02 ", "Severity": "High"}, {"Assets": "A99", "Severity": "Low"}]
+    out = combine_and_match([], pdf_rows, key="Assets", param_index=index)
+    assert len(out) == 1
+    assert out[0]["csv_Reference Squad"] == "TeamY"
+
+
+def test_xlsx_duplicate_headers_are_kept(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Assets", "Owner", "Owner"])
+    ws.append(["A1", "x", "y"])
+    path = str(tmp_path / "dup.xlsx")
+    wb.save(path)
+
+    out = load_parameter_table(path, with_metadata=True)
+    assert out["records"] == [{"Assets": "A1", "Owner": "x", "Owner_dup": "y"}]
+    assert out["metadata"]["columns"] == ["Assets", "Owner", "Owner_dup"]
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from agents.pdf_parameter_agent.pipeline import StageCache, run_report_pipeline
+from tests._pdf_factory import make_pdf
+
+TITLE = "Disclosed Vulnerabilities for legacy findings"
+
+
+def _run(tmp_path, params, key="Assets", job="job1"):
+    return run_report_pipeline(str(params), str(tmp_path / "report.pdf"),
+                               str(tmp_path / job / "result.csv"), key,
+                               title=TITLE, cache=StageCache(str(tmp_path / "cache")))
+
+
+def test_rerun_only_recomputes_downstream_of_changes(tmp_path):
+    make_pdf(str(tmp_path / "report.pdf"), [[TITLE]],
+             tables={0: [["Severity", "Assets", "Description"], ["High", "A01", "Old TLS"]]})
+    params = tmp_path / "params.csv"
+    params.write_text("Assets,Owner,Team\nA01,Marco,X\n")
+
+    first = _run(tmp_path, params)
+    assert first["rows"] == 1
+    assert set(first["stages"].values()) == {"computed"}
+
+    # stessi input: nulla da ricalcolare oltre al salvataggio
+    again = _run(tmp_path, params, job="job2")
+    assert again["stages"] == {"load_params": "unused", "extract_table": "unused", "join_index": "unused",
+                               "combine": "skipped", "save": "computed"}
+
+    # tabella parametri modificata: titolo ed estrazione del PDF non si rifanno
+    params.write_text("Assets,Owner,Team\nA01,Giulia,Y\n")
+    changed = _run(tmp_path, params, job="job3")
+    assert changed["stages"]["extract_table"] == "skipped"
+    assert changed["stages"]["load_params"] == "computed"
+    assert changed["stages"]["combine"] == "computed"
+
+    # solo la chiave di join cambia: anche il caricamento parametri è riusato
+    rekeyed = _run(tmp_path, params, key="Owner", job="job4")
+    assert rekeyed["stages"]["load_params"] == "skipped"
+    assert rekeyed["stages"]["extract_table"] == "skipped"
+    assert rekeyed["stages"]["join_index"] == "computed"
+    assert rekeyed["rows"] == 0
+
+
+def test_custom_join_key_survives_column_selection(tmp_path):
+    make_pdf(str(tmp_path / "report.pdf"), [[TITLE]],
+             tables={0: [["Severity", "Host", "Description"], ["High", "srv1", "Old TLS"]]})
+    params = tmp_path / "params.csv"
+    params.write_text("Host,Owner\nsrv1,Marco\n")
+
+    result = _run(tmp_path, params, key="Host")
+    assert result["rows"] == 1
+    # cambiando la chiave la tabella completa in cache viene riusata
+    rekeyed = _run(tmp_path, params, key="Severity", job="job2")
+    assert rekeyed["stages"]["extract_table"] == "skipped"
+
+def test_stage_cache_concurrent_put_and_missing_entry(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"))
+    errors = []
+
+    def writer():
+        try:
+            for _ in range(20):
+                cache.put("combine", "k", [{"Assets": "A01"}])
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert cache.get("combine", "k") == [{"Assets": "A01"}]
+
+    # un output rimosso (es. da prune) è un miss, non un errore
+    assert cache.prune(0) == 1
+    with pytest.raises(KeyError):
+        cache.get("combine", "k")
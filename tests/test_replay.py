@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+from google.adk.models.llm_request import LlmRequest
+from google.genai import types
+
+from replay import ReplayLlm
+
+RECORDED_MSG = "- load(file_path='data/input/old/p.csv')\n- save(output_path='data/output/old/result.csv')"
+ACTUAL_MSG = "- load(file_path='data/input/new/p.csv')\n- save(output_path='data/output/new/result.csv')"
+
+
+def _write_recording(path):
+    lines = [
+        {"kind": "header", "message": RECORDED_MSG},
+        {"kind": "event", "function_calls": [{"name": "load", "args": {"file_path": "data/input/old/p.csv"}}]},
+        {"kind": "event", "function_responses": [{"name": "load", "response": {"handle": "params_OLD"}}]},
+        {"kind": "event", "function_calls": [{"name": "save", "args": {
+            "records_handle": "params_OLD", "output_path": "data/output/old/result.csv"}}],
+         "usage_metadata": {"prompt_token_count": 10, "candidates_token_count": 2, "total_token_count": 12}},
+    ]
+    path.write_text("\n".join(json.dumps(l) for l in lines))
+    return str(path)
+
+
+def _generate(llm, contents):
+    async def run():
+        return [r async for r in llm.generate_content_async(LlmRequest(contents=contents))]
+    return asyncio.run(run())[0]
+
+
+def test_replay_rewrites_paths_and_handles(tmp_path):
+    llm = ReplayLlm.from_file(_write_recording(tmp_path / "rec.jsonl"))
+    user = types.Content(role="user", parts=[types.Part(text=ACTUAL_MSG)])
+
+    first = _generate(llm, [user])
+    assert first.content.parts[0].function_call.args == {"file_path": "data/input/new/p.csv"}
+
+    model = types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name="load", args={}))])
+    tool = types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+        name="load", response={"handle": "params_NEW"}))])
+    second = _generate(llm, [user, model, tool])
+    assert second.content.parts[0].function_call.args == {
+        "records_handle": "params_NEW", "output_path": "data/output/new/result.csv"}
+    assert second.usage_metadata.total_token_count == 12
+
+    done = _generate(llm, [user, model, tool, model, tool])
+    assert done.content.parts[0].text == "replay exhausted"
+
+
+def test_replay_ignores_non_handle_strings(tmp_path):
+    lines = [
+        {"kind": "header", "message": RECORDED_MSG},
+        {"kind": "event", "function_calls": [{"name": "load", "args": {"file_path": "data/input/old/p.csv"}}]},
+        {"kind": "event", "function_responses": [{"name": "load", "response": {
+            "handle": "params_OLD", "columns": ["d", "t"], "status": "success"}}]},
+        {"kind": "event", "function_calls": [{"name": "save", "args": {
+            "records_handle": "params_OLD", "output_path": "data/output/old/result.csv"}}]},
+    ]
+    path = tmp_path / "rec.jsonl"
+    path.write_text("\n".join(json.dumps(l) for l in lines))
+    llm = ReplayLlm.from_file(str(path))
+
+    user = types.Content(role="user", parts=[types.Part(text=ACTUAL_MSG)])
+    model = types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(name="load", args={}))])
+    # colonne e status diversi dalla registrazione non devono toccare path e handle
+    tool = types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(
+        name="load", response={"handle": "params_NEW", "columns": ["Severity", "Severity"], "status": "ok"}))])
+    second = _generate(llm, [user, model, tool])
+    assert second.content.parts[0].function_call.args == {
+        "records_handle": "params_NEW", "output_path": "data/output/new/result.csv"}
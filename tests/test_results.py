@@ -0,0 +1,32 @@
+import os
+
+from agents.pdf_parameter_agent import tools
+from agents.pdf_parameter_agent.tools import parquet_sidecar_path, save_csv_output
+from results import read_result_page
+
+
+def _records(n):
+    return [{"Assets": f"A{i:04d}", "Severity": "High" if i % 2 else "Low"} for i in range(n)]
+
+
+def test_page_is_sliced_from_parquet_row_groups(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "PARQUET_ROW_GROUP_SIZE", 10)
+    path = save_csv_output(_records(95), str(tmp_path / "result.csv"))["path"]
+    assert os.path.exists(parquet_sidecar_path(path))
+
+    page = read_result_page(path, offset=18, limit=5)
+    assert page["source"] == "parquet"
+    assert page["total_rows"] == 95 and page["columns"] == ["Assets", "Severity"]
+    assert [r["Assets"] for r in page["rows"]] == ["A0018", "A0019", "A0020", "A0021", "A0022"]
+
+    assert [r["Assets"] for r in read_result_page(path, offset=93, limit=10)["rows"]] == ["A0093", "A0094"]
+    assert read_result_page(path, offset=500, limit=10)["rows"] == []
+
+
+def test_page_falls_back_to_csv(tmp_path):
+    path = save_csv_output(_records(12), str(tmp_path / "result.csv"))["path"]
+    os.remove(parquet_sidecar_path(path))
+
+    page = read_result_page(path, offset=10, limit=5)
+    assert page["source"] == "csv" and page["total_rows"] == 12
+    assert page["rows"] == [{"Assets": "A0010", "Severity": "Low"}, {"Assets": "A0011", "Severity": "High"}]
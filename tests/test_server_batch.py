@@ -0,0 +1,76 @@
+import io
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import server
+from blob_store import BlobStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "DATA_INPUT_DIR", str(tmp_path / "input"))
+    monkeypatch.setattr(server, "DATA_OUTPUT_DIR", str(tmp_path / "output"))
+    monkeypatch.setattr(server, "blob_store", BlobStore(str(tmp_path / "blobs")))
+    monkeypatch.setattr(server, "_maybe_gc", lambda: None)
+    return TestClient(server.app)
+
+
+def _post_batch(client):
+    return client.post("/run-batch", files=[
+        ("params_file", ("params.csv", b"Assets,Owner\nA01,Marco\n")),
+        ("pdf_files", ("a.pdf", b"%PDF-1.4")),
+    ])
+
+
+def test_broken_batch_pool_is_replaced(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise BrokenProcessPool("worker died")
+
+    monkeypatch.setattr(server, "run_batch", broken)
+    pool = server._get_batch_pool()
+
+    resp = _post_batch(client)
+    assert resp.status_code == 503
+    assert server._batch_pool is None
+    # la richiesta successiva ottiene un pool nuovo
+    fresh = server._get_batch_pool()
+    assert fresh is not pool
+    server._discard_batch_pool(fresh)
+
+
+def test_unique_batch_name_terminates_on_colliding_prefixes():
+    seen = set()
+    names = [server._unique_batch_name(n, seen) for n in ("2_a.pdf", "a.pdf", "a.pdf", "A.pdf")]
+    assert names == ["2_a.pdf", "a.pdf", "1_a.pdf", "3_A.pdf"]
+
+
+def _zip_bytes(entries):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_iter_batch_pdfs_rejects_too_many_entries(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_ZIP_MAX_ENTRIES", 2)
+    data = _zip_bytes([(f"r{i}.pdf", b"%PDF") for i in range(3)])
+    with pytest.raises(HTTPException) as exc:
+        list(server._iter_batch_pdfs("many.zip", data))
+    assert exc.value.status_code == 413
+
+
+def test_iter_batch_pdfs_rejects_oversized_entry(monkeypatch):
+    monkeypatch.setattr(server, "BATCH_ZIP_MAX_FILE_MB", 1)
+    # comprime a pochi KB, ma il file_size dichiarato supera il limite per file
+    data = _zip_bytes([("big.pdf", b"0" * (2 * 1024 * 1024)), ("ok.pdf", b"%PDF")])
+    with pytest.raises(HTTPException) as exc:
+        list(server._iter_batch_pdfs("bomb.zip", data))
+    assert exc.value.status_code == 413
+
+    monkeypatch.setattr(server, "BATCH_ZIP_MAX_FILE_MB", 200)
+    assert [name for name, _ in server._iter_batch_pdfs("bomb.zip", data)] == ["big.pdf", "ok.pdf"]
@@ -0,0 +1,93 @@
+from agents.pdf_parameter_agent import tools
+from agents.pdf_parameter_agent.tools import (
+    _scan_page_range,
+    _scan_pages_parallel,
+    _score_title_candidates,
+    find_title_pages,
+)
+from tests._pdf_factory import make_pdf
+
+TITLE = "Disclosed Vulnerabilities for legacy findings"
+
+
+def _match_kwargs():
+    return {
+        "target_title": TITLE,
+        "allow_partial": True,
+        "min_token_coverage": 0.8,
+        "jaccard_threshold": 0.6,
+    }
+
+
+def test_score_prefers_exact_line_over_partial():
+    lines = ["Summary", "see Disclosed Vulnerabilities for legacy findings below", TITLE]
+    ranked = _score_title_candidates(lines, TITLE)
+    assert ranked[0]["strategy"] == "exact"
+    assert ranked[0]["line_span"] == [2, 2]
+    assert any(c["strategy"] == "contains" for c in ranked)
+
+
+def test_score_title_split_on_two_lines():
+    ranked = _score_title_candidates(["Disclosed Vulnerabilities", "for legacy findings"], TITLE)
+    assert ranked[0]["strategy"] == "exact_joined"
+    assert ranked[0]["line_span"] == [0, 1]
+
+
+def test_find_title_pages_ranks_best_first(tmp_path):
+    pages = [
+        ["Intro", "Vulnerabilities for legacy findings, disclosed"],  # solo copertura token
+        ["Filler"],
+        ["Appendix", TITLE],
+    ]
+    pdf_path = make_pdf(str(tmp_path / "report.pdf"), pages)
+
+    ranked = find_title_pages(pdf_path, TITLE, top_k=2)
+    assert [c["page"] for c in ranked] == [2, 0]
+    assert ranked[0]["strategy"] == "exact"
+
+
+def test_parallel_scan_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "PARALLEL_MIN_PAGES", 1)
+    pages = [[f"Filler page {i}", "nothing to see here"] for i in range(40)]
+    pages[5] = ["see Disclosed Vulnerabilities for legacy findings below"]
+    pages[23] = ["Appendix", TITLE]
+    pages[31] = [TITLE]
+    pdf_path = make_pdf(str(tmp_path / "report.pdf"), pages)
+
+    sequential = _scan_page_range(pdf_path, 0, None, _match_kwargs(), early_exit_score=1.0)
+    parallel = _scan_pages_parallel(pdf_path, _match_kwargs(), early_exit_score=1.0, max_workers=3)
+    assert [c["page"] for c in sequential] == [5, 23]
+    assert parallel == sequential
+
+
+def test_parallel_scan_without_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "PARALLEL_MIN_PAGES", 1)
+    pages = [[f"Filler page {i}"] for i in range(10)]
+    pdf_path = make_pdf(str(tmp_path / "report.pdf"), pages)
+
+    assert _scan_pages_parallel(pdf_path, _match_kwargs(), max_workers=2) == []
+
+
+def test_extract_early_exit_on_contains_match(tmp_path):
+    pages = [
+        ["see Disclosed Vulnerabilities for legacy findings below"],
+        ["Filler"],
+        [TITLE],
+    ]
+    tables = {0: [["Assets", "Severity"], ["a1", "High"]],
+              2: [["Assets", "Severity"], ["a2", "Low"]]}
+    pdf_path = make_pdf(str(tmp_path / "report.pdf"), pages, tables)
+
+    # default: il match "contains" a pagina 0 chiude la ricerca
+    assert tools.extract_pdf_table_by_title(pdf_path, TITLE)[0]["Assets"] == "a1"
+    # soglia 1.0: solo il match esatto ferma la scansione, e vince nel ranking
+    assert tools.extract_pdf_table_by_title(pdf_path, TITLE, early_exit_score=1.0)[0]["Assets"] == "a2"
+
+
+def test_find_title_pages_default_stops_on_fragment_title(tmp_path):
+    pages = [["Filler"], ["see Disclosed Vulnerabilities for legacy findings below"], ["Filler"], [TITLE]]
+    pdf_path = make_pdf(str(tmp_path / "report.pdf"), pages)
+
+    # il match "contains" a pagina 1 chiude la scansione: pagina 3 non viene letta
+    assert [c["page"] for c in find_title_pages(pdf_path, TITLE)] == [1]
+    assert [c["page"] for c in find_title_pages(pdf_path, TITLE, early_exit_score=None)] == [3, 1]
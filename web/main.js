@@ -1,3 +1,9 @@
+// Altezza fissa di una riga della tabella risultati (px): serve alla virtualizzazione
+const ROW_HEIGHT = 28;
+// Righe richieste al server per pagina e righe extra disegnate sopra/sotto la vista
+const PAGE_SIZE = 200;
+const OVERSCAN = 10;
+
 async function runAgent() {
     const params = document.getElementById("params").files[0];
     const pdf = document.getElementById("pdf").files[0];
@@ -5,6 +11,7 @@ async function runAgent() {
 
     const out = document.getElementById("output");
     out.textContent = "Running...";
+    clearResults();
 
     if (!params || !pdf) {
         out.textContent = "Please select both files.";
@@ -20,9 +27,135 @@ async function runAgent() {
         const resp = await fetch("/run-agent", { method: "POST", body: form });
         const data = await resp.json();
         out.textContent = JSON.stringify(data, null, 2);
+        if (resp.ok && data.job_id) {
+            await showResults(data.job_id);
+        }
     } catch (e) {
         out.textContent = "Error: " + e.message;
     }
 }
 
-document.getElementById("run").addEventListener("click", runAgent);
\ No newline at end of file
+// -----------------------------------------------------------------------------
+// Tabella risultati virtualizzata: le righe arrivano a pagine da /results/{job_id}
+// e nel DOM ci sono solo quelle visibili (più OVERSCAN). Le pagine la cui richiesta
+// fallisce restano in 'failed' e non vengono richieste di nuovo per lo stesso job.
+// -----------------------------------------------------------------------------
+const results = { jobId: null, total: 0, columns: [], pages: new Map(), loading: new Set(), failed: new Set() };
+
+function clearResults() {
+    results.jobId = null;
+    results.total = 0;
+    results.columns = [];
+    results.pages.clear();
+    results.loading.clear();
+    results.failed.clear();
+    document.getElementById("results").hidden = true;
+}
+
+// Ritorna true solo se la pagina è stata caricata ora (e quindi va ridisegnata)
+async function fetchPage(pageNo) {
+    if (results.pages.has(pageNo) || results.loading.has(pageNo) || results.failed.has(pageNo)) {
+        return false;
+    }
+    const jobId = results.jobId;
+    results.loading.add(pageNo);
+    try {
+        const resp = await fetch(`/results/${jobId}?offset=${pageNo * PAGE_SIZE}&limit=${PAGE_SIZE}`);
+        const data = resp.ok ? await resp.json() : null;
+        if (jobId !== results.jobId) {
+            return false; // nel frattempo è partito un altro job
+        }
+        if (!data) {
+            results.failed.add(pageNo);
+            return false;
+        }
+        results.total = data.total_rows;
+        results.columns = data.columns;
+        results.pages.set(pageNo, data.rows);
+        return true;
+    } catch (e) {
+        if (jobId === results.jobId) {
+            results.failed.add(pageNo);
+        }
+        return false;
+    } finally {
+        results.loading.delete(pageNo);
+    }
+}
+
+function rowAt(index) {
+    const page = results.pages.get(Math.floor(index / PAGE_SIZE));
+    return page ? page[index % PAGE_SIZE] : null;
+}
+
+async function showResults(jobId) {
+    results.jobId = jobId;
+    await fetchPage(0);
+    if (results.jobId !== jobId || !results.columns.length) {
+        return;
+    }
+    const header = document.getElementById("results-header");
+    header.replaceChildren(...results.columns.map(c => {
+        const cell = document.createElement("div");
+        cell.textContent = c;
+        return cell;
+    }));
+    header.style.gridTemplateColumns = `repeat(${results.columns.length}, minmax(120px, 1fr))`;
+    document.getElementById("results-count").textContent = `${results.total} rows`;
+    document.getElementById("results-spacer").style.height = `${results.total * ROW_HEIGHT}px`;
+    document.getElementById("results").hidden = false;
+    document.getElementById("results-viewport").scrollTop = 0;
+    renderRows();
+}
+
+function renderRows() {
+    const viewport = document.getElementById("results-viewport");
+    const body = document.getElementById("results-rows");
+    const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(results.total, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+
+    const missing = new Set();
+    const rows = [];
+    for (let i = first; i < last; i++) {
+        const row = rowAt(i);
+        const pageNo = Math.floor(i / PAGE_SIZE);
+        const failed = !row && results.failed.has(pageNo);
+        if (!row && !failed) {
+            missing.add(pageNo);
+        }
+        const line = document.createElement("div");
+        line.className = "results-row";
+        line.style.gridTemplateColumns = `repeat(${results.columns.length}, minmax(120px, 1fr))`;
+        for (const col of results.columns) {
+            const cell = document.createElement("div");
+            cell.textContent = row ? (row[col] ?? "") : (failed ? "⚠" : "…");
+            line.appendChild(cell);
+        }
+        rows.push(line);
+    }
+    body.style.transform = `translateY(${first * ROW_HEIGHT}px)`;
+    body.replaceChildren(...rows);
+
+    // carica le pagine mancanti e ridisegna solo quando una arriva davvero
+    for (const pageNo of missing) {
+        fetchPage(pageNo).then(loaded => {
+            if (loaded) {
+                requestAnimationFrame(renderRows);
+            }
+        });
+    }
+}
+
+let scrollScheduled = false;
+function onResultsScroll() {
+    if (!scrollScheduled) {
+        scrollScheduled = true;
+        requestAnimationFrame(() => {
+            scrollScheduled = false;
+            renderRows();
+        });
+    }
+}
+
+document.getElementById("run").addEventListener("click", runAgent);
+document.getElementById("results-viewport").addEventListener("scroll", onResultsScroll);